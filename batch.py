@@ -0,0 +1,235 @@
+#This module simulates many games at once with NumPy, for bot training and
+#balancing. Every board is stored as packed uint16 rows (bit x is set if
+#column x is filled) so moves, drops and line clears are array operations
+#across all boards instead of one Engine at a time
+
+import numpy as np
+import pieces
+from pieces import X_MARGIN
+
+#Index of each tetrimino type in the arrays below
+TYPE_INDEX = {mino:i for (i,mino) in enumerate(pieces.PIECE_TYPES)}
+
+
+def placement_tables(width):
+    """
+    Builds arrays of tetrimino row masks already shifted to each column
+    from pieces.shifted_row_masks
+
+    Parameters:
+    width(int): number of columns on the board
+
+    Returns:
+    tuple: (masks,valid) where masks[type,rot,x+X_MARGIN] is the four
+    row masks of the tetrimino box and valid[type,rot,x+X_MARGIN] is True
+    if the tetrimino is inside the board at x
+    """
+
+    table = pieces.shifted_row_masks(width)
+    columns = width + X_MARGIN + 1
+    masks = np.zeros((7,4,columns,4),np.uint16)
+    valid = np.zeros((7,4,columns),bool)
+
+    for (mino,i) in TYPE_INDEX.items():
+        for rot in range(4):
+            for (column,rows) in enumerate(table[mino][rot]):
+                if rows is None:
+                    continue
+
+                valid[i,rot,column] = True
+                for (dy,mask) in rows:
+                    masks[i,rot,column,dy] = mask
+
+    return (masks,valid)
+
+
+class BatchEngine:
+    """
+    Plays n games in lockstep, each call to place hard drops the current
+    piece of every board. T-spins aren't detected as pieces are dropped
+    straight down from their spawn height
+    """
+
+    def __init__(self,n,width=10,height=22,seed=None,shown_pieces=2) -> None:
+        """
+        Parameters:
+        n(int): number of boards
+        width(int): number of columns, at most 16
+        height(int): number of rows
+        seed: seed for the piece randomizers, None for random games
+        shown_pieces(int): number of next pieces in queue, at most 7
+        """
+
+        if width > 16:
+            raise ValueError("width must be 16 or less to fit in uint16 rows")
+
+        self.n = n
+        self.width = width
+        self.height = height
+        self.shown_pieces = shown_pieces
+        self.full_row_mask = (1 << width) - 1
+
+        #Spawn position, the same as Engine.drop_pos
+        self.drop_pos = (3,0)
+
+        #Scores, the same as engine.Score with level 1
+        self.line_scores = np.array([0,100,300,500,800],np.int64)
+
+        (self.masks,self.valid) = placement_tables(width)
+        self.rng = np.random.default_rng(seed)
+
+        self.reset()
+
+    def reset(self):
+        """Starts new games on every board"""
+
+        n = self.n
+        self.boards = np.zeros((n,self.height),np.uint16)
+        self.index = np.arange(n)
+
+        #Two 7-bags per board so the queue can always be shown, position
+        #is where each board is in the first bag
+        self.sequence = np.concatenate([self.new_bags(n),self.new_bags(n)],1)
+        self.position = np.zeros(n,np.int64)
+
+        self.held = np.full(n,-1,np.int8)
+
+        self.score = np.zeros(n,np.int64)
+        self.lines = np.zeros(n,np.int64)
+        self.pieces_placed = np.zeros(n,np.int64)
+        self.game_over = np.zeros(n,bool)
+
+    def new_bags(self,count):
+        #Shuffled 7-bags, one per row
+        return self.rng.permuted(np.tile(np.arange(7,dtype=np.int8),
+                                         (count,1)),axis=1)
+
+    @property
+    def current(self):
+        """Type index of the piece each board is about to place"""
+        return self.sequence[self.index,self.position]
+
+    @property
+    def queue(self):
+        """Type indexes of the next pieces, shape (n,shown_pieces)"""
+        offsets = np.arange(1,self.shown_pieces+1)
+        return self.sequence[self.index[:,None],self.position[:,None]+offsets]
+
+    def x_range(self,types,rotation):
+        """
+        Gets the lowest and highest x each piece can be placed at
+
+        Parameters:
+        types(np.ndarray): type indexes
+        rotation(np.ndarray): rotations from 0 to 3
+
+        Returns:
+        tuple: (lowest,highest) arrays of x positions
+        """
+
+        valid = self.valid[types,rotation]
+        lowest = np.argmax(valid,1) - X_MARGIN
+        highest = valid.shape[1] - 1 - np.argmax(valid[:,::-1],1) - X_MARGIN
+        return (lowest,highest)
+
+    def advance(self,boards):
+        #Move the given boards on to their next piece, refilling bags
+
+        self.position[boards] += 1
+
+        finished = boards[self.position[boards] >= 7]
+        if len(finished) > 0:
+            self.sequence[finished,:7] = self.sequence[finished,7:]
+            self.sequence[finished,7:] = self.new_bags(len(finished))
+            self.position[finished] = 0
+
+    def hold(self,boards):
+        #Swap the current piece of the given boards with their held piece
+
+        has_held = self.held[boards] >= 0
+        empty = boards[~has_held]
+        swap = boards[has_held]
+
+        # Boards without a held piece move on to their next piece
+        self.held[empty] = self.current[empty]
+        self.advance(empty)
+
+        # Boards with a held piece swap it with the current piece
+        swapped_in = self.held[swap]
+        self.held[swap] = self.sequence[swap,self.position[swap]]
+        self.sequence[swap,self.position[swap]] = swapped_in
+
+    def place(self,x,rotation,hold=None):
+        """
+        Hard drops the current piece of every board that isn't over
+
+        Parameters:
+        x(np.ndarray): x position of each piece, like Piece.x
+        rotation(np.ndarray): rotation of each piece from 0 to 3
+        hold(np.ndarray): bools, if True the held piece is swapped in
+        before placing (the next piece if nothing is held)
+
+        Returns:
+        np.ndarray: number of lines cleared on each board
+        """
+
+        x = np.asarray(x,np.int64)
+        rotation = np.asarray(rotation,np.int64) % 4
+        alive = ~self.game_over
+
+        if hold is not None:
+            self.hold(self.index[alive & np.asarray(hold,bool)])
+
+        types = self.current
+
+        # Boards placing outside the board are over
+        column = np.clip(x + X_MARGIN,0,self.valid.shape[2]-1)
+        placeable = self.valid[types,rotation,column] & (column == x+X_MARGIN)
+        self.game_over |= alive & ~placeable
+        alive &= placeable
+
+        piece_masks = self.masks[types,rotation,column]
+
+        # Test the piece at every height at once, rows below the board
+        # are full so every piece collides with something
+        padded = np.concatenate([self.boards,
+                                 np.full((self.n,4),0xFFFF,np.uint16)],1)
+        windows = np.lib.stride_tricks.sliding_window_view(padded,4,axis=1)
+        collides = (windows[:,self.drop_pos[1]:] &
+                    piece_masks[:,None,:]).any(2)
+        landing = np.argmax(collides,1) - 1 + self.drop_pos[1]
+
+        # Boards that can't fit the piece at its spawn height are over
+        self.game_over |= alive & (landing < self.drop_pos[1])
+        alive &= landing >= self.drop_pos[1]
+
+        # Lock pieces into the boards
+        boards = self.index[alive]
+        rows = landing[alive,None] + np.arange(4)
+        inside = rows < self.height
+        lock_boards = np.broadcast_to(boards[:,None],rows.shape)[inside]
+        self.boards[lock_boards,rows[inside]] |= piece_masks[alive][inside]
+
+        # Clear lines by moving full rows to the top of each board with a
+        # stable sort then emptying them
+        full = self.boards == self.full_row_mask
+        cleared = full.sum(1)
+        if cleared.any():
+            order = np.argsort(~full,axis=1,kind="stable")
+            self.boards = np.take_along_axis(self.boards,order,1)
+            self.boards[np.arange(self.height)[None,:] < cleared[:,None]] = 0
+
+        # Score the same as Engine with a hard drop
+        self.score[alive] += (self.line_scores[cleared[alive]] +
+                              2*landing[alive])
+        self.lines += cleared
+        self.pieces_placed[alive] += 1
+
+        self.advance(boards)
+
+        # Boards where the next piece can't spawn are over
+        spawn_masks = self.masks[self.current,0,self.drop_pos[0]+X_MARGIN]
+        spawn_rows = self.boards[:,self.drop_pos[1]:self.drop_pos[1]+4]
+        self.game_over |= (spawn_rows & spawn_masks).any(1)
+
+        return cleared
@@ -0,0 +1,388 @@
+#This module has an AI player that plays an Engine using the same actions
+#as Events, for demo mode, load testing and benchmarking the engine. It
+#doesn't use pygame
+
+import time
+import engine,pieces,search
+
+#Weights used to score a board, positive weights are good
+DEFAULT_WEIGHTS = {
+    "height":-0.51,
+    "holes":-0.36,
+    "bumpiness":-0.18,
+    "well":0.05,
+    "t_slots":0.3,
+    "lines":0.76,
+    "t_spin":1.5,
+}
+
+#Placement finders for each board setup, kept per process so pool
+#workers keep their caches between moves
+_finders = {}
+
+
+def get_finder(width,height,rotation_system,spawn):
+    """Gets a PlacementFinder shared by every search with the same setup"""
+
+    key = (width,height,rotation_system,spawn)
+    if key not in _finders.keys():
+        _finders[key] = search.PlacementFinder(width,height,rotation_system,
+                                               spawn)
+    return _finders[key]
+
+
+def place(masks,width,mino,rot,x,y):
+    """
+    Locks a tetrimino into a copy of a bitboard and clears full rows
+
+    Returns:
+    tuple: (new masks as a tuple, number of lines cleared), or None if
+    part of the tetrimino is above the board, which ends the game
+    """
+
+    new_masks = list(masks)
+    for (dy,mask) in pieces.ROW_MASKS[mino][rot]:
+        if y + dy < 0:
+            return None
+        new_masks[y+dy] |= pieces.shift_mask(mask,x)
+
+    full_row_mask = (1 << width) - 1
+    kept = [row for row in new_masks if row != full_row_mask]
+    lines = len(new_masks) - len(kept)
+
+    return (tuple([0]*lines + kept),lines)
+
+
+def evaluate(masks,width,weights):
+    """
+    Scores a board using heights, holes, bumpiness, well depth and the
+    number of T-slots, higher is better
+    """
+
+    height = len(masks)
+    heights = [0]*width
+    holes = 0
+
+    # Rows are read from the top, covered has a bit for every column
+    # with a block above the current row
+    covered = 0
+    for (row_num,row) in enumerate(masks):
+        holes += bin(covered & ~row).count("1")
+        new_columns = row & ~covered
+        while new_columns:
+            bit = new_columns & -new_columns
+            heights[bit.bit_length()-1] = height - row_num
+            new_columns ^= bit
+        covered |= row
+
+    bumpiness = 0
+    for x in range(width-1):
+        bumpiness += abs(heights[x]-heights[x+1])
+
+    # Deepest column with higher columns (or walls) on both sides
+    well = 0
+    for x in range(width):
+        left = heights[x-1] if x > 0 else height
+        right = heights[x+1] if x < width-1 else height
+        well = max(well,min(left,right)-heights[x])
+
+    return (weights["height"]*sum(heights) +
+            weights["holes"]*holes +
+            weights["bumpiness"]*bumpiness +
+            weights["well"]*well +
+            weights["t_slots"]*count_t_slots(masks,width,heights))
+
+
+def count_t_slots(masks,width,heights):
+    """
+    Counts places a T could spin into upside down, an empty T shape
+    with the cells over its arms filled
+    """
+
+    height = len(masks)
+    top = height - max(heights)
+    t_slots = 0
+
+    for y in range(max(top-1,1),height-1):
+        above = masks[y-1]
+        row = masks[y]
+        below = masks[y+1]
+
+        for x in range(width-2):
+            # The three cells of the row and the cell below the middle
+            # are empty, with an overhang on one side above
+            if ((row >> x) & 7 == 0 and not (below >> (x+1)) & 1 and
+                (below >> x) & 5 == 5 and (above >> x) & 5 != 0 and
+                not (above >> (x+1)) & 1):
+                t_slots += 1
+
+    return t_slots
+
+
+def expand(finder,node,sequence,weights,width,can_hold=True):
+    """
+    Gets every node after placing the next piece of a node, with and
+    without using hold
+
+    Parameters:
+    node(tuple): (reward,masks,hold,index,first) where index is the
+    position in sequence and first is the root move it came from
+    sequence(tuple): tetrimino types in the order they come
+    can_hold(bool): if hold can be used for this piece
+
+    Returns:
+    list: (score,node) pairs
+    """
+
+    (reward,masks,hold,index,first) = node
+    if index >= len(sequence):
+        return []
+
+    # Choices of (piece to place, piece held after, next index, held)
+    choices = [(sequence[index],hold,index+1,False)]
+    if not can_hold:
+        pass
+    elif hold is None:
+        if index+1 < len(sequence):
+            choices.append((sequence[index+1],sequence[index],index+2,True))
+    elif hold != sequence[index]:
+        choices.append((hold,sequence[index],index+1,True))
+
+    children = []
+    for (mino,new_hold,new_index,held) in choices:
+        for placement in finder.find(masks,mino):
+            placed = place(masks,width,mino,placement.rotation,
+                           placement.x,placement.y)
+
+            # Placements that top out are never chosen
+            if placed is None:
+                continue
+            (new_masks,lines) = placed
+
+            new_reward = reward + weights["lines"]*lines
+            if placement.spin and lines > 0:
+                new_reward += weights["t_spin"]*lines
+
+            move = first
+            if move is None:
+                move = (held,placement)
+
+            score = new_reward + evaluate(new_masks,width,weights)
+            children.append((score,(new_reward,new_masks,new_hold,
+                                    new_index,move)))
+
+    return children
+
+
+def search_root(args):
+    """
+    Beam search below one root move, run in pool workers
+
+    Parameters:
+    args(tuple): (score,node,sequence,depth,beam_width,weights,setup,
+    deadline) where setup is the arguments for get_finder
+
+    Returns:
+    tuple: (best score at each depth searched,root move), scores of
+    different roots can only be compared at the same depth
+    """
+
+    (score,node,sequence,depth,beam_width,weights,setup,deadline) = args
+    finder = get_finder(*setup)
+    width = setup[0]
+
+    scores = [score]
+    beam = [(score,node)]
+
+    while len(scores) <= depth:
+        if time.time() > deadline:
+            break
+
+        children = []
+        for (_,child) in beam:
+            children += expand(finder,child,sequence,weights,width)
+
+        # Nothing below this depth, either every piece shown has been
+        # placed or every placement tops out
+        if len(children) == 0:
+            if any(child[3] < len(sequence) for (_,child) in beam):
+                score = float("-inf")
+            else:
+                score = scores[-1]
+            scores += [score]*(depth+1-len(scores))
+            break
+
+        children.sort(key=lambda c:c[0],reverse=True)
+        beam = children[:beam_width]
+        scores.append(beam[0][0])
+
+    return (scores,node[4])
+
+
+class Bot:
+    """
+    Picks placements with a beam search over the next pieces, and turns
+    them into inputs for Engine.step at a fixed number of pieces per
+    second
+    """
+
+    def __init__(self,depth=2,beam_width=8,pps=2,time_budget=0.05,
+                 processes=None,weights=None) -> None:
+        """
+        Parameters:
+        depth(int): pieces searched after the first one
+        beam_width(int): nodes kept at each depth
+        pps(float): most pieces placed per second
+        time_budget(float): seconds allowed to pick each move
+        processes(int): number of pool processes to spread the search
+        over, None searches in this process
+        weights(dict): board scoring weights, see DEFAULT_WEIGHTS
+        """
+
+        self.depth = depth
+        self.beam_width = beam_width
+        self.pps = pps
+        self.time_budget = time_budget
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights is not None:
+            self.weights.update(weights)
+
+        self.processes = processes
+        self.pool = None
+
+        self.actions = []
+        self.planned_for = None
+        self.drop_timer = 0
+
+    def close(self):
+        """Stops the pool processes"""
+
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def choose(self,game):
+        """
+        Picks a move for the active piece of an Engine
+
+        Returns:
+        tuple: (held,placement) or None if there is no move
+        """
+
+        deadline = time.time() + self.time_budget
+        setup = (game.width,game.height,game.rotation_system.name,
+                 game.drop_pos)
+        finder = get_finder(*setup)
+
+        sequence = (game.active.type,) + tuple(p.type for p in game.queue)
+        hold = None
+        if game.held is not None:
+            hold = game.held.type
+
+        # Holding is only allowed once per piece
+        root = (0,tuple(game.board.masks),hold,0,None)
+        roots = expand(finder,root,sequence,self.weights,game.width,
+                       not game.used_swap)
+
+        if len(roots) == 0:
+            return None
+
+        # Search the most promising roots first in case time runs out
+        roots.sort(key=lambda c:c[0],reverse=True)
+        tasks = [(score,node,sequence,self.depth,self.beam_width,
+                  self.weights,setup,deadline) for (score,node) in roots]
+
+        if self.processes is None:
+            results = []
+            for task in tasks:
+                results.append(search_root(task))
+                if time.time() > deadline:
+                    break
+        else:
+            # Only imported when a pool is used, it is slow to import
+            import multiprocessing
+
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.processes)
+
+            results = []
+            pending = self.pool.imap_unordered(search_root,tasks)
+            try:
+                for _ in tasks:
+                    results.append(pending.next(max(deadline-time.time(),0)))
+            except multiprocessing.TimeoutError:
+                pass
+
+            # Fall back on the placement scores if nothing came back
+            if len(results) == 0:
+                results = [([score],node[4]) for (score,node) in roots]
+
+        # Roots are compared at the deepest depth all of them reached as
+        # deeper scores are lower or higher for every root
+        common = min(len(scores) for (scores,_) in results) - 1
+        return max(results,key=lambda r:r[0][common])[1]
+
+    def plan(self,game):
+        # Turn the chosen move into a list of actions
+
+        self.actions = []
+        move = self.choose(game)
+        if move is None:
+            self.actions = ["hard_drop"]
+            return
+
+        (held,placement) = move
+        if held:
+            self.actions.append("hold_block")
+        self.actions += list(placement.path)
+
+    def update(self,dt,game):
+        """
+        Gets the inputs for the next step of an Engine
+
+        Parameters:
+        dt(float): time passed in seconds
+        game(Engine): game being played
+
+        Returns:
+        engine.Inputs: actions for Engine.step
+        """
+
+        self.drop_timer += dt
+
+        if game.game_over:
+            return engine.Inputs(["enter"])
+
+        # Wait for lines to clear
+        if len(game.scored_lines) > 0:
+            return engine.Inputs()
+
+        # Plan again whenever a piece has locked or a new game started
+        current = (id(game.board),game.pieces_placed)
+        if current != self.planned_for:
+            self.planned_for = current
+            self.plan(game)
+
+        if len(self.actions) == 0:
+            return engine.Inputs()
+
+        action = self.actions[0]
+
+        # Down is held until the piece lands
+        if action == "down":
+            if game.drop_distance() > 0:
+                return engine.Inputs(held=["down"])
+            self.actions.pop(0)
+            if len(self.actions) == 0:
+                return engine.Inputs()
+            action = self.actions[0]
+
+        # Hard drops wait so pieces are placed at the set rate
+        if action == "hard_drop" and self.drop_timer < 1/self.pps:
+            return engine.Inputs()
+
+        if action == "hard_drop":
+            self.drop_timer = 0
+
+        self.actions.pop(0)
+        return engine.Inputs([action])
@@ -0,0 +1,178 @@
+#This module builds and opens the asset bundle, one file with the fonts and
+#every style already cut up and packed. Pixels are stored raw so the game
+#can map the file into memory and use them without decoding any images.
+#Run this file to build the bundle after changing anything in sprites/
+
+import json,mmap,os,struct
+import pygame as pg
+import sprites
+
+BUNDLE_PATH = "assets.bundle"
+
+#The file starts with MAGIC and the length of a json header, pixel blocks
+#start on a multiple of ALIGN bytes so they line up with memory pages
+MAGIC = b"TETBNDL1"
+ALIGN = 4096
+VERSION = 1
+
+
+def build(path=BUNDLE_PATH):
+    """
+    Builds the asset bundle from the fonts and styles in sprites/
+
+    Parameters:
+    path(str): file to write the bundle to
+
+    Returns:
+    int: size of the bundle in bytes
+    """
+
+    header = {"version":VERSION,"sources":{},"fonts":{},"styles":{}}
+    blocks = []
+
+    def add_block(surface):
+        # Queue the pixels of a surface, offsets are set once the size of
+        # the header is known
+        blocks.append(pg.image.tobytes(surface,"RGBA"))
+        return {"block":len(blocks)-1,"size":list(surface.get_size())}
+
+    fonts = sprites.Fonts()
+    for (font_type,file_name) in fonts.font_files.items():
+        font_path = fonts.path + file_name
+        header["fonts"][font_type] = add_block(pg.image.load(font_path))
+        header["sources"].update(sprites.file_stamps([font_path]))
+
+    styles = sprites.Styles(sprites.Sprites())
+    for style in styles.style_list.values():
+        (atlas,data) = style.pack()
+
+        entry = add_block(atlas)
+        entry["data"] = data
+        entry["config"] = style.config
+        header["styles"][style.folder] = entry
+
+        header["sources"].update(sprites.file_stamps([style.cfg_file]+
+                                                     style.sources()))
+
+    # The header is written once block offsets are known, which depend on
+    # the length of the header
+    offsets = [0]*len(blocks)
+    header_bytes = b""
+    while True:
+        position = len(MAGIC) + 4 + len(header_bytes)
+        for (i,block) in enumerate(blocks):
+            position += -position % ALIGN
+            offsets[i] = position
+            position += len(block)
+
+        for entry in list(header["fonts"].values())+list(header["styles"].values()):
+            entry["offset"] = offsets[entry["block"]]
+
+        # Offsets only move if the header changed length
+        new_header = json.dumps(header).encode()
+        done = len(new_header) == len(header_bytes)
+        header_bytes = new_header
+        if done:
+            break
+
+    with open(path,"wb") as f:
+        f.write(MAGIC + struct.pack("<I",len(header_bytes)) + header_bytes)
+        for (offset,block) in zip(offsets,blocks):
+            f.write(bytes(offset-f.tell()))
+            f.write(block)
+        size = f.tell()
+
+    return size
+
+
+class Bundle:
+    """
+    An asset bundle mapped into memory. Font spritesheets stay views of
+    the mapped pages, style atlases are converted to the display format
+    when they are loaded so only their first read comes from the map
+    """
+
+    def __init__(self,path=BUNDLE_PATH) -> None:
+        """
+        Parameters:
+        path(str): bundle file
+        """
+
+        self.path = path
+        self.file = open(path,"rb")
+        self.map = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+
+        start = len(MAGIC) + 4
+        (header_len,) = struct.unpack("<I",self.map[len(MAGIC):start])
+        self.header = json.loads(self.map[start:start+header_len])
+
+        if self.header["version"] != VERSION:
+            raise ValueError(f"{path} was built by another version")
+
+        self.fonts = self.header["fonts"]
+        self.styles = self.header["styles"]
+
+    def changed_sources(self):
+        """
+        Gets source files that changed since the bundle was built, files
+        that are missing are ignored so the bundle can ship on its own
+
+        Returns:
+        list: paths of changed files
+        """
+
+        changed = []
+        for (path,file_stamp) in self.header["sources"].items():
+            if (os.path.exists(path) and
+                sprites.file_stamps([path])[path] != file_stamp):
+                changed.append(path)
+        return changed
+
+    def surface(self,entry):
+        """
+        Wraps the pixels of a font or style in a surface without copying
+
+        Parameters:
+        entry(dict): font or style from the header
+
+        Returns:
+        pg.Surface: RGBA surface using the mapped pixels
+        """
+
+        (w,h) = entry["size"]
+        offset = entry["offset"]
+        pixels = memoryview(self.map)[offset:offset+w*h*4]
+        return pg.image.frombuffer(pixels,(w,h),"RGBA")
+
+
+def open_bundle(path=BUNDLE_PATH):
+    """
+    Opens the asset bundle if there is one and it is up to date
+
+    Returns:
+    Bundle: the bundle, or None if the assets should be loaded from
+    their own files
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        asset_bundle = Bundle(path)
+    except (OSError,ValueError) as error:
+        print(f"Not using asset bundle: {error}")
+        return None
+
+    if len(asset_bundle.changed_sources()) > 0:
+        print(f"Not using {path} as assets changed, run bundle.py")
+        return None
+
+    return asset_bundle
+
+
+if __name__ == "__main__":
+    size = build()
+    print(f"Built {BUNDLE_PATH} ({size} bytes)")
@@ -0,0 +1,733 @@
+#This module has the rules of the game (board, piece queue, gravity, lock
+#delay, hold and scoring) without any rendering. It doesn't use pygame so
+#games can be simulated without a display, Grid wraps it to draw it
+
+from array import array
+from collections import deque
+import pieces,randomizer,rotation
+
+#Names of the actions the engine reads from inputs, these match the key
+#map ids used by Events
+ACTIONS = ("left","right","down","rotate_clock","rotate_anti_clock",
+           "rotate_180","hard_drop","hold_block")
+
+
+class Inputs:
+    """
+    Pressed and held actions for one step, has the same key_pressed and
+    key_held functions as Events so either can be passed to Engine.step
+    """
+
+    def __init__(self,pressed=(),held=()) -> None:
+        """
+        Parameters:
+        pressed(iterable): actions pressed this step
+        held(iterable): actions held down this step
+        """
+
+        self.pressed = set(pressed)
+        self.held = set(held)
+
+    def key_pressed(self,action):
+        return action in self.pressed
+
+    def key_held(self,action):
+        return action in self.held
+
+
+class Piece:
+    """A tetrimino in the queue, hold slot or falling on the board"""
+
+    __slots__ = ("type","x","y","rotation","tags")
+
+    def __init__(self,type) -> None:
+        """
+        Parameters:
+        type(str): The letter of the tetrimino (J,L,O,T,Z,S,I)
+        """
+
+        self.type = type
+        self.x = 0
+        self.y = 0
+        self.rotation = 0
+
+        #Values from 1 to 65535 stored in the board for each block when
+        #the piece locks, renderers can replace these with sprite ids
+        self.tags = (pieces.PIECE_TYPES.index(type)+1,)*4
+
+    def __repr__(self) -> str:
+        return f"Piece({self.type},{self.x},{self.y},{self.rotation})"
+
+
+class Board:
+    """
+    Locked blocks, stored as one bitmask per row (bit x is set if column
+    x is filled) along with a flat array of the tag of every cell, where
+    0 is an empty cell, and the number of filled cells in each row
+    """
+
+    def __init__(self,width=10,height=22) -> None:
+        """
+        Parameters:
+        width(int): number of columns
+        height(int): number of rows
+        """
+
+        self.width = width
+        self.height = height
+        self.full_row_mask = (1 << width) - 1
+
+        self.masks = [0] * height
+        self.counts = [0] * height
+        self.cells = array("H",bytes(2 * width * height))
+
+        #Tags of a row with nothing in it
+        self.empty_row = array("H",bytes(2 * width))
+
+    def cell(self,x,y):
+        """Get the tag of the cell at x,y, 0 if it is empty"""
+        return self.cells[y*self.width + x]
+
+    def row(self,y):
+        """Get a copy of the tags of row y"""
+        return self.cells[y*self.width:(y+1)*self.width]
+
+    def occupied(self,x,y):
+        """Check if a locked block is at x,y, outside the board is empty"""
+
+        if y < 0 or y >= self.height or x < 0 or x >= self.width:
+            return False
+        return (self.masks[y] >> x) & 1 == 1
+
+    def fits(self,mino,rot,x,y):
+        """Check if a tetrimino can be at x,y with rotation rot"""
+        return pieces.fits(self.masks,self.width,mino,rot,x,y)
+
+    def drop_distance(self,mino,rot,x,y):
+        """Get how many rows a tetrimino can fall before landing"""
+        return pieces.drop_distance(self.masks,mino,rot,x,y)
+
+    def place(self,piece):
+        """
+        Locks a piece into the board
+
+        Returns:
+        bool: False if any block was above the top of the board
+        """
+
+        inside = True
+
+        # Tags only change what is stored for each cell, cells without a
+        # tag store the piece type's index
+        tags = piece.tags
+        default_tag = pieces.PIECE_TYPES.index(piece.type) + 1
+
+        for (i,(dx,dy)) in enumerate(pieces.CELLS[piece.type][piece.rotation]):
+            x = piece.x + dx
+            y = piece.y + dy
+
+            if y < 0:
+                inside = False
+                continue
+
+            self.masks[y] |= 1 << x
+            self.counts[y] += 1
+            self.cells[y*self.width + x] = tags[i] if i < len(tags) else default_tag
+
+        return inside
+
+    def full_rows(self,rows=None):
+        """
+        Gets full rows using the count of filled cells in each row
+
+        Parameters:
+        rows(iterable): row numbers to check, every row if None
+
+        Returns:
+        list: full row numbers from top to bottom
+        """
+
+        if rows is None:
+            rows = range(self.height)
+
+        full_rows = []
+        for row_num in sorted(rows):
+            if 0 <= row_num < self.height and self.counts[row_num] == self.width:
+                full_rows.append(row_num)
+        return full_rows
+
+    def clear_rows(self,rows):
+        """
+        Removes rows and moves the rows above them down. Each block of
+        rows between cleared rows is moved once with a slice copy, so a
+        tetris moves the stack above it once rather than four times
+
+        Parameters:
+        rows(list): row numbers from top to bottom
+        """
+
+        width = self.width
+        cells = self.cells
+        lists = (self.masks,self.counts)
+
+        # Blocks are moved from the bottom up so each one moves into
+        # rows that were cleared or have already moved down
+        shift = 0
+        for (i,row_num) in reversed(list(enumerate(rows))):
+            shift += 1
+            top = rows[i-1]+1 if i > 0 else 0
+
+            if top < row_num:
+                cells[(top+shift)*width:(row_num+shift)*width] = \
+                    cells[top*width:row_num*width]
+                for values in lists:
+                    values[top+shift:row_num+shift] = values[top:row_num]
+
+        # Rows left at the top are empty
+        cells[0:shift*width] = array("H",bytes(2 * width * shift))
+        for values in lists:
+            values[0:shift] = [0]*shift
+
+
+class Score:
+    """Keeps the score using the scoring rules of the game"""
+
+    def __init__(self,record_pending=True) -> None:
+        """
+        Parameters:
+        record_pending(bool): if every score added is also put in
+        pending_scores so it can be shown, headless games turn this off
+        """
+
+        self.single = 100
+        self.double = 300
+        self.triple = 500
+        self.quad = 800
+
+        self.m_spin_single = 200
+        self.m_spin_double = 400
+
+        self.spin_single = 800
+        self.spin_double = 1200
+        self.spin_triple = 1600
+
+        self.combo_score = 50
+
+        self.record_pending = record_pending
+        self.reset()
+
+    def reset(self):
+        """Sets the score back to the start of a game"""
+
+        self.score = 0
+        self.pending_scores = []
+
+        self.level = 1
+        self.combo = 0
+
+    def add(self,score_add):
+        """Adds to the score"""
+
+        self.score += score_add
+        if self.record_pending:
+            self.pending_scores.append(score_add)
+
+    def score_lines(self,lines):
+        """Score a normal line from 1 to 4"""
+
+        score_add = 0
+
+        match lines:
+            case 1:
+                score_add = self.single
+            case 2:
+                score_add = self.double
+            case 3:
+                score_add = self.triple
+            case 4:
+                score_add = self.quad
+
+        self.add(score_add * self.level)
+
+    def score_spin(self,lines,t_spin_mini=False):
+        """Score a t-spin or mini t-spin"""
+
+        score_add = 0
+
+        if t_spin_mini:
+            match lines:
+                case 1:
+                    score_add = self.m_spin_single
+                case 2:
+                    score_add = self.m_spin_double
+
+        else:
+            match lines:
+                case 1:
+                    score_add = self.spin_single
+                case 2:
+                    score_add = self.spin_double
+                case 3:
+                    score_add = self.spin_triple
+
+        self.add(score_add * self.level)
+
+    def score_drop(self,cells,soft_drop=False):
+        if soft_drop:
+            self.add(int(cells))
+        else:
+            self.add(int(cells*2))
+
+
+class Engine:
+    """
+    Runs a single game, Engine.step is called with the inputs for a step
+    and the time passed in seconds
+    """
+
+    def __init__(self,width=10,height=22,seed=None,rotation_system="SRS",
+                 score=None,randomizer_name="7-bag") -> None:
+        """
+        Parameters:
+        width(int): number of columns on the board
+        height(int): number of rows on the board
+        seed: seed for the piece randomizer, None for a random game,
+        games with the same seed get the same pieces
+        rotation_system(str): name of rotation system (SRS, SRS+, ARS)
+        score(Score): score object to use, one that doesn't record
+        pending scores is made if not given
+        randomizer_name(str): name of piece randomizer (7-bag, 14-bag,
+        memoryless, tgm)
+        """
+
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.randomizer_name = randomizer_name
+        self.rotation_system = rotation.get_system(rotation_system)
+        self.score = score
+        if self.score is None:
+            self.score = Score(False)
+
+        self.drop_pos = (3,0)
+        self.shown_pieces = 2
+
+        self.lock_time_max = 1
+        self.gravity_time_max = 0.8
+        self.gravity_time_max_held = 0.05
+
+        self.dir_held_max = 0.25
+        self.dir_held_skip = 0.17
+
+        #Time full rows stay on the board before being cleared, renderers
+        #set this to the length of their line clear animation
+        self.clear_delay = 0
+
+        self.reset()
+
+    def reset(self):
+        """Starts a new game with an empty board"""
+
+        self.board = Board(self.width,self.height)
+        self.randomizer = randomizer.get_randomizer(self.randomizer_name,
+                                                    self.seed)
+
+        self.active = None
+        self.held = None
+        self.used_swap = False
+
+        self.last_move_rotation = False
+        self.last_piece = None
+
+        #Pieces shown as next, made from the randomizer as needed
+        self.queue = deque()
+
+        self.lock_time = 0
+        self.gravity_time = 0
+        self.dir_held_time = 0
+
+        self.clear_time = 0
+        self.scored_lines = []
+
+        self.game_over = False
+        self.lines = 0
+        self.pieces_placed = 0
+        self.score.reset()
+
+        self.update_queue()
+        self.next_piece()
+
+    def set_rotation_system(self,name):
+        """Change rotation system by name (SRS, SRS+, ARS)"""
+        self.rotation_system = rotation.get_system(name)
+
+    def step(self,inputs,dt):
+        """
+        Advances the game
+
+        Parameters:
+        inputs(Inputs): pressed and held actions, Events can also be used
+        dt(float): time passed in seconds
+        """
+
+        if self.game_over:
+            return
+
+        # Nothing moves while full rows are waiting to be cleared
+        if len(self.scored_lines) > 0:
+            self.clear_time += dt
+            if self.clear_time >= self.clear_delay:
+                self.score_lines()
+            return
+
+        self.update_input(dt,inputs)
+
+        if not self.game_over:
+            self.update_gravity(dt,inputs)
+
+    def valid_pos(self,x_offset=0,y_offset=0,rot=None):
+        """Check if the active piece fits after an offset/rotation"""
+
+        piece = self.active
+        if rot is None:
+            rot = piece.rotation
+        return self.board.fits(piece.type,rot,
+                               piece.x+x_offset,piece.y+y_offset)
+
+    def drop_distance(self):
+        """Get how many rows the active piece can fall before landing"""
+
+        piece = self.active
+        return self.board.drop_distance(piece.type,piece.rotation,
+                                        piece.x,piece.y)
+
+    def landed(self):
+        """Check if the active piece is resting on something"""
+        return not self.valid_pos(0,1)
+
+    def lock_progress(self,extra=0):
+        """
+        How far through the lock delay the active piece is, 0 to 1
+
+        Parameters:
+        extra(float): seconds to add to the lock time, used to draw
+        between steps
+        """
+        return min((self.lock_time+extra)/self.lock_time_max,1)
+
+    def move(self,x_offset):
+        """
+        Moves the active piece sideways if possible
+
+        Returns:
+        bool: True if the piece moved
+        """
+
+        if self.valid_pos(x_offset,0):
+            self.active.x += x_offset
+            return True
+        return False
+
+    def rotate(self,turns=1):
+        """
+        Rotates active piece by clockwise quarter turns (-1 for
+        anti-clockwise, 2 for 180) using the kicks of the rotation system
+
+        Returns:
+        bool: True if the piece rotated
+        """
+
+        piece = self.active
+        origin_rot = piece.rotation
+        new_rot = (origin_rot+turns)%4
+
+        #The first translation is always (0,0)
+        for (kick_x,kick_y) in self.rotation_system.kicks(piece.type,
+                                                          origin_rot,
+                                                          new_rot):
+            if self.board.fits(piece.type,new_rot,
+                               piece.x+kick_x,piece.y+kick_y):
+                piece.rotation = new_rot
+                piece.x += kick_x
+                piece.y += kick_y
+                return True
+
+        return False
+
+    def hard_drop(self):
+        """Drops the active piece to the bottom and locks it"""
+
+        # A piece rotated into a spot it can't fall from still counts
+        # as a spin when hard dropped
+        distance = self.drop_distance()
+        if distance > 0:
+            self.last_move_rotation = False
+
+        self.active.y += distance
+        self.lock(False)
+
+    def hold(self):
+        """
+        Swaps the active piece with the held piece, only once per piece
+
+        Returns:
+        bool: True if the pieces were swapped
+        """
+
+        if self.used_swap:
+            return False
+
+        if self.held is None:
+            self.held = self.active
+            self.next_piece()
+        else:
+            (self.held,self.active) = (self.active,self.held)
+            self.spawn(self.active)
+
+        self.used_swap = True
+        self.held.x = 0
+        self.held.y = 0
+        self.held.rotation = 0
+        return True
+
+    def update_input(self,dt,inputs):
+        #  Handles the different inputs into the game
+
+        if inputs.key_pressed("left") and self.valid_pos(-1,0):
+            self.last_move_rotation = False
+            self.lock_time = 0
+            self.active.x -= 1
+
+        elif inputs.key_held("left"):
+
+            if self.dir_held_time > self.dir_held_max and self.valid_pos(-1,0):
+                self.active.x -= 1
+                self.dir_held_time = self.dir_held_skip
+
+            elif self.dir_held_time < self.dir_held_max:
+                self.dir_held_time += dt
+
+        elif inputs.key_pressed("right") and self.valid_pos(1,0):
+            self.last_move_rotation = False
+            self.lock_time = 0
+            self.active.x += 1
+
+        elif inputs.key_held("right"):
+
+            if self.dir_held_time > self.dir_held_max and self.valid_pos(1,0):
+                self.active.x += 1
+                self.dir_held_time = self.dir_held_skip
+
+            elif self.dir_held_time < self.dir_held_max:
+                self.dir_held_time += dt
+
+        else:
+            self.dir_held_time = 0
+
+        if inputs.key_pressed("rotate_clock"):
+            self.last_move_rotation = True
+            self.lock_time = 0
+            self.rotate()
+        elif inputs.key_pressed("rotate_anti_clock"):
+            self.last_move_rotation = True
+            self.lock_time = 0
+            self.rotate(-1)
+        elif inputs.key_pressed("rotate_180"):
+            self.last_move_rotation = True
+            self.lock_time = 0
+            self.rotate(2)
+
+        if inputs.key_pressed("hard_drop"):
+            self.hard_drop()
+            if self.game_over:
+                return
+
+        if inputs.key_pressed("hold_block"):
+            self.hold()
+
+    def update_gravity(self,dt,inputs):
+        #Updates gravity and checks if piece should lock
+
+        #If down key is held, gravity progresses faster
+
+        if ((inputs.key_held("down") and
+            self.gravity_time > self.gravity_time_max_held)
+            or (self.gravity_time > self.gravity_time_max)):
+
+            self.gravity_time = 0
+
+            if self.valid_pos(0,1):
+                self.active.y += 1
+                self.lock_time = 0
+
+        else:
+            self.gravity_time += dt
+
+        #Count down lock delay while the piece is resting on something
+
+        if self.landed():
+            self.lock_time += dt
+
+            if self.lock_time > self.lock_time_max:
+                self.lock_time = 0
+                self.lock()
+
+    def lock(self,soft_drop=True):
+        #Put the active piece into the board and spawn the next one
+
+        if not self.board.place(self.active):
+            self.game_over = True
+
+        self.pieces_placed += 1
+
+        # Only rows the piece was locked into can have become full
+        piece = self.active
+        self.scored_lines = self.board.full_rows(
+            piece.y+dy for (dy,_) in pieces.ROW_MASKS[piece.type][piece.rotation])
+        self.score.score_drop(self.active.y,soft_drop)
+
+        self.next_piece()
+
+        if len(self.scored_lines) > 0 and self.clear_delay <= 0:
+            self.score_lines()
+
+    def score_lines(self):
+        # Score and remove full rows
+
+        piece = self.last_piece
+        lines = len(self.scored_lines)
+
+        # Check for t spins
+        t_spin = False
+        if piece.type == "T" and self.last_move_rotation:
+
+            corner_pos = [(piece.x,piece.y),
+                          (piece.x+2,piece.y),
+                          (piece.x+2,piece.y+2),
+                          (piece.x,piece.y+2)]
+
+            facing_corner_pos = [corner_pos[piece.rotation],
+                                 corner_pos[(piece.rotation+1)%4]]
+
+            active_corners = 0
+            facing_corners = 0
+
+            for (x,y) in corner_pos:
+                if self.board.occupied(x,y):
+                    active_corners += 1
+                    if (x,y) in facing_corner_pos:
+                        facing_corners += 1
+
+            if active_corners >= 3:
+                t_spin = True
+                #t spin mini if both facing corners are filled
+                self.score.score_spin(lines,facing_corners == 2)
+
+        if not t_spin:
+            self.score.score_lines(lines)
+
+        self.board.clear_rows(self.scored_lines)
+
+        self.lines += lines
+        self.scored_lines = []
+        self.clear_time = 0
+
+    def update_queue(self):
+        #Fill the queue from the randomizer
+
+        while len(self.queue) < self.shown_pieces:
+            self.queue.append(Piece(next(self.randomizer)))
+
+    def spawn(self,piece):
+        #Move a piece to the top of the board
+
+        (piece.x,piece.y) = self.drop_pos
+        piece.rotation = 0
+        self.lock_time = 0
+        self.gravity_time = 0
+
+        if not self.board.fits(piece.type,0,piece.x,piece.y):
+            self.game_over = True
+
+    def next_piece(self):
+        # Change to the next piece
+
+        self.last_piece = self.active
+
+        self.active = self.queue.popleft()
+        self.spawn(self.active)
+        self.update_queue()
+
+        self.used_swap = False
+
+
+class FixedStep:
+    """
+    Runs a game at a fixed number of steps per second however often it
+    is drawn, so gravity, DAS and lock delay don't depend on the frame
+    rate. Frame times are added to an accumulator and whole steps are
+    run from it
+    """
+
+    def __init__(self,rate=120,max_steps=12) -> None:
+        """
+        Parameters:
+        rate(int): steps per second
+        max_steps(int): most steps run in one frame, time past that is
+        dropped so a slow frame doesn't cause a longer one
+        """
+
+        self.rate = rate
+        self.tick = 1/rate
+        self.max_steps = max_steps
+
+        self.accumulator = 0
+        self.steps = 0
+
+        #Actions pressed since the last step, kept until a step reads
+        #them as frames can be shorter than a step
+        self.pressed = set()
+
+    @property
+    def alpha(self):
+        """How far the accumulator is towards the next step, 0 to 1"""
+        return self.accumulator/self.tick
+
+    def advance(self,dt,inputs,step):
+        """
+        Adds frame time and runs every step that is due
+
+        Parameters:
+        dt(float): time passed in seconds
+        inputs(Inputs): pressed and held actions this frame, Events can
+        also be used
+        step(function): called with Inputs for each step
+
+        Returns:
+        int: number of steps run
+        """
+
+        for action in ACTIONS + ("enter",):
+            if inputs.key_pressed(action):
+                self.pressed.add(action)
+
+        self.accumulator += dt
+        steps = int(self.accumulator/self.tick)
+
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = steps*self.tick
+
+        if steps == 0:
+            return 0
+
+        held = [action for action in ACTIONS if inputs.key_held(action)]
+
+        #Presses only go to the first step so they happen once
+        for _ in range(steps):
+            step(Inputs(self.pressed,held))
+            self.pressed = set()
+
+        self.accumulator -= steps*self.tick
+        self.steps += steps
+        return steps
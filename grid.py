@@ -1,13 +1,13 @@
 import pygame as pg
-from random import shuffle
-import figure,easing
+from array import array
+import figure,easing,engine
 
 V = pg.Vector2
 
 class Grid:
     """
-    This is a class that controls how figures are moved/dropped
-    as well as rotation translation from the SRS
+    This is a class that draws a game run by engine.Engine, it passes
+    inputs to the engine and shows the board, figures and score
     """
 
     def __init__(self,window,styles) -> None:
@@ -22,41 +22,51 @@ class Grid:
         self.rect = None
         self.update_rect(window)
 
-        self.drop_pos = V(3,0)
+        #Line clear animation, each column plays the score animation for
+        #clear_cell_time seconds, starting clear_cell_offset of that after
+        #the column to its left
+        self.clear_cell_time = 0.6
+        self.clear_cell_offset = 0.02
+
+        #The engine runs the game rules, Score adds drawing to the
+        #engine's scoring rules
+        self.engine = engine.Engine(int(self.grid_dims[0]),
+                                    int(self.grid_dims[1]),
+                                    score=Score())
+        self.engine.clear_delay = self.animation_length()
+
+        #The engine is stepped at a fixed rate, drawing happens between
+        #steps using stepper.alpha. player gives the inputs for each step
+        #in place of events when it is set, such as a bot.Bot
+        self.stepper = engine.FixedStep()
+        self.player = None
+
+        #Figure objects used to draw each piece, made when a piece is
+        #first shown
+        self.figures = {}
 
         self.active_figure = None
         self.held_figure = None
-
-        self.last_move_rotation = False
-        self.last_figure = None
-
         self.next_figures = []
-        self.figure_bag = []
-        self.shown_pieces = 2
 
         self.ghost_pos = V(0,0)
-        self.used_swap = False
-
-        self.lock_time = 0
-        self.lock_time_max = 1
-        self.gravity_time = 0
-        self.gravity_time_max = 0.8
-        self.gravity_time_max_held = 0.05
 
-        self.dir_held_time = 0
-        self.dir_held_max = 0.25
-        self.dir_held_skip = 0.17
+        #Locked blocks are drawn onto stack_surf, which is only redrawn
+        #when a piece locks or lines clear. stack_rows has the sprite ids
+        #drawn in each row and stack_state is the engine state it shows
+        self.background = (0,0,10)
+        self.stack_surf = pg.Surface(self.rect.size)
+        self.stack_surf.fill(self.background)
+        self.stack_rows = [array("H",[0]*int(self.grid_dims[0]))
+                           for _ in range(int(self.grid_dims[1]))]
+        self.stack_state = None
 
-        self.animate_time = 0
-        self.scored_lines = []
+        self.update_figures(styles)
 
-        self.block_dict = {}
+    @property
+    def score(self):
+        return self.engine.score
 
-        self.score = Score()
-
-        self.update_bag(styles)
-        self.next_piece(styles)
-    
     def update_rect(self,window):
         #Update rect to size of window.game_dims
 
@@ -66,457 +76,244 @@ class Grid:
         
         small_game_rect = pg.Rect((0,0),window.game_dims)
         self.rect.center = small_game_rect.center
-    
-    def update_gravity(self,dt,events,styles):
-        #Updates gravity and checks if figure should lock
-
-        #If down key is held, gravity progresses faster
-
-        if ((events.key_held("down") and 
-            self.gravity_time > self.gravity_time_max_held)
-            or (self.gravity_time > self.gravity_time_max)):
-
-            self.gravity_time = 0
-
-            if self.valid_pos(V(0,1)):
-                self.active_figure.pos += V(0,1)
-                self.lock_time = 0
-
-        else:
-            self.gravity_time += dt
-        
-        #Play animation if figure has started locking
-
-        if not self.valid_pos(V(0,1)):
-            t = self.lock_time/self.lock_time_max
-            self.active_figure.alpha = easing.lerp(t,255,100)
-            
-            self.lock_time += dt
-
-            if self.lock_time > self.lock_time_max:
-                self.lock_time = 0
-                self.set_figure(styles)
-        else:
-            self.active_figure.alpha = 255
-
-        #Get ghost pos (hard drop translation)
-
-        ghost_check = V(0,0)
-        while self.valid_pos(ghost_check + V(0,1)):
-            ghost_check += V(0,1)
-        
-        self.ghost_pos = V(ghost_check)
-    
-    def set_figure(self,styles,soft_drop=True):
-        #Destroy current figure and put it into block_list
 
-        for block in self.active_figure.block_list:
-            row_num = int(block.pos[1])
-            if row_num not in self.block_dict.keys():
-                self.block_dict[row_num] = []
-            self.block_dict[row_num].append(block)
+    def set_rotation_system(self,name):
+        #Change rotation system by name (SRS, SRS+, ARS)
+        self.engine.set_rotation_system(name)
 
-        self.score_update()
-        self.score.score_drop(self.active_figure.pos[1],soft_drop)
+    def get_figure(self,piece,styles):
+        # Get the Figure drawn for an engine piece, creating it if needed
 
-        self.next_piece(styles)
-        
-    def get_blocks(self,pos_only=False):
-        block_list = []
-        for (row_num,row) in self.block_dict.items():
-            
-            for b in row:
-                if pos_only:
-                    block_list.append(b.pos)
-                else:
-                    block_list.append(b)
-        
-        return block_list
-
-    def update_input(self,dt,events,styles):
-        #  Handles the different inputs into the game
-
-        if events.key_pressed("left") and self.valid_pos(V(-1,0)):
-            self.last_move_rotation = False
-            self.lock_time = 0
-            self.active_figure.pos += V(-1,0)
+        if piece not in self.figures.keys():
+            new_figure = figure.Figure(piece.type,V(0,0),styles)
+            self.figures[piece] = new_figure
 
-        elif events.key_held("left"):
+            # Locked blocks keep the sprite of the figure they came from,
+            # sprite ids start at 1 as 0 is an empty cell
+            piece.tags = tuple(b.sprite_id for b in new_figure.block_list)
 
-            if self.dir_held_time > self.dir_held_max and self.valid_pos(V(-1,0)):
-                self.active_figure.pos += V(-1,0)
-                self.dir_held_time = self.dir_held_skip
-
-            elif self.dir_held_time < self.dir_held_max :
-                self.dir_held_time += dt
-        
-        elif events.key_pressed("right") and self.valid_pos(V(1,0)):
-            self.last_move_rotation = False
-            self.lock_time = 0
-            self.active_figure.pos += V(1,0)
-
-        elif events.key_held("right"):
-
-            if self.dir_held_time > self.dir_held_max  and self.valid_pos(V(1,0)):
-                self.active_figure.pos += V(1,0)
-                self.dir_held_time = self.dir_held_skip
-
-            elif self.dir_held_time < self.dir_held_max :
-                self.dir_held_time += dt
-        
-        else:
-            self.dir_held_time = 0
-        
-        if events.key_pressed("rotate_clock"):
-            self.last_move_rotation = True
-            self.lock_time = 0
-            self.rotate()
-        elif events.key_pressed("rotate_anti_clock"):
-            self.last_move_rotation = True
-            self.lock_time = 0
-            self.rotate(False)
-        
-        if events.key_pressed("hard_drop"):
-            
-            hard_check = V(0,0)
-            while self.valid_pos(hard_check + V(0,1)):
-                hard_check += V(0,1)
-            
-            self.last_move_rotation = False
-            self.active_figure.pos += hard_check
-            self.active_figure.update_block_pos()
-            self.set_figure(styles,False)
+        return self.figures[piece]
 
-        
-        if events.key_pressed("hold_block") and not self.used_swap:
-            if self.held_figure is None:
-                self.held_figure = self.active_figure
-                self.next_piece(styles)
-            else:
-                temp = self.held_figure
-                self.held_figure = self.active_figure
-                self.active_figure = temp
-                self.active_figure.pos = V(self.drop_pos)
-            
-            self.used_swap = True
-            self.held_figure.pos = V(0,0)
+    def update_figures(self,styles):
+        # Match figures to the pieces in the engine
 
-    def rotate(self,clockwise=True):
-        #Rotates active figure and uses wall kick data when needed
+        game = self.engine
+        shown = [game.active] + list(game.queue)
+        if game.held is not None:
+            shown.append(game.held)
 
-        origin_rot= int(self.active_figure.rotation)
+        # Forget figures of pieces that have locked
+        if len(self.figures) > len(shown):
+            self.figures = {p:self.figures[p] for p in shown
+                            if p in self.figures.keys()}
 
-        #rotate clockwise or counter-clockwise
+        self.active_figure = self.get_figure(game.active,styles)
+        self.active_figure.pos.update(game.active.x,game.active.y)
+        self.active_figure.rotation = game.active.rotation
 
-        new_rot = None
-        if clockwise:
-            new_rot = int((origin_rot+1)%4)
+        #Fade figure while it is locking
+        if game.landed():
+            t = game.lock_progress(self.render_time())
+            self.active_figure.alpha = easing.lerp(t,255,100)
         else:
-            new_rot = origin_rot-1
-            if new_rot < 0:
-                new_rot = 3
-        
-        change_key = f"{origin_rot}>{new_rot}"
-        wallkick_trans = figure.WALLKICK_DATA[change_key]
-        if self.active_figure.type == "I":
-            wallkick_trans = figure.WALLKICK_DATA_I[change_key]
-
-        self.active_figure.rotation = new_rot
-        self.active_figure.update_block_pos()
-
-        #use wallkick data to check if rotation is possible
-
-        if not self.valid_pos():
-            valid_translation = None
-            for translation in wallkick_trans:
-                if self.valid_pos(translation):
-                    valid_translation = translation
-                    break
-            
-            if valid_translation is None:
-                self.active_figure.rotation = origin_rot
-            else:
-                self.active_figure.pos += translation
-
-    def valid_pos(self,offset=V(0,0)):
-        #check if offset/rotation is valid
-
-        for block_move in self.active_figure.block_list:
-            new_pos = V(block_move.pos) + V(offset)
-
-            for block_set in self.get_blocks():
-                if new_pos == block_set.pos:
-                    return False
-            
-            if (new_pos[0] < 0 or 
-                new_pos[0] > self.grid_dims[0]-1 or
-                new_pos[1] > self.grid_dims[1]-1):
-                return False
-        
-        return True
-
-    def update_bag(self,styles):
-        #update figure_bag and next_figures
+            self.active_figure.alpha = 255
 
-        while len(self.figure_bag) == 0 or len(self.next_figures) < self.shown_pieces:
+        self.next_figures = [self.get_figure(p,styles) for p in game.queue]
 
-            if len(self.figure_bag) == 0:
-                for type in ["I","O","J","L","S","Z","T"]:
-                    self.figure_bag.append(figure.Figure(type,
-                                                         V(0,0),
-                                                         styles))
-                shuffle(self.figure_bag)
-            
-            if len(self.next_figures) < self.shown_pieces:
-                self.next_figures.append(self.figure_bag.pop(0))
+        self.held_figure = None
+        if game.held is not None:
+            self.held_figure = self.get_figure(game.held,styles)
 
-    def next_piece(self,styles):
-        # Change to the next figure
+        for f in self.next_figures + [self.held_figure]:
+            if f is not None:
+                f.pos.update(0,0)
+                f.rotation = 0
 
-        self.last_figure = self.active_figure
+        #Get ghost pos (hard drop translation)
+        self.ghost_pos[1] = game.drop_distance()
 
-        self.active_figure = self.next_figures.pop(0)
-        self.active_figure.pos = V(self.drop_pos)
-        self.update_bag(styles)
+    def get_widget_draws(self,sprites):
+        # Get draws of the held and next figures beside the board
 
-        self.used_swap = False
-    
-    def draw_widgets(self,dt,window,sprites,fonts):
+        draws = []
 
         side_stuff_rect = pg.Rect(V(0,0),V(16*4,16*3))
         side_stuff_rect.top = self.rect.top
         side_stuff_rect.right = self.rect.left
         if not self.held_figure is None:
-            self.held_figure.update(window,sprites,side_stuff_rect.topleft)
+            self.held_figure.update_block_pos()
+            draws += self.held_figure.get_draws(sprites,
+                                                side_stuff_rect.topleft)
         
         side_stuff_rect.left = self.rect.right
         for f in self.next_figures:
-            f.update(window,sprites,side_stuff_rect.topleft)
+            f.update_block_pos()
+            draws += f.get_draws(sprites,side_stuff_rect.topleft)
             side_stuff_rect.top += side_stuff_rect.height
-        
-        self.score.update(dt,window,fonts,V(side_stuff_rect.topleft))
-
-    def score_update(self):
-        # Checks if grid can score
 
-        for row_num in range(int(self.grid_dims[1])):
-            if row_num in self.block_dict.keys():
-                row = self.block_dict[row_num]
-                #If score move all previous rows down
-                if len(row) >= self.grid_dims[0]:
-                    self.scored_lines.append(row_num)
+        return draws
 
-    def score_lines(self):
-        # Score lines
+    def draw_score(self,dt,window,fonts):
+        # Draw the score below the next figures
 
-        # Check for t spins
-        if self.last_figure.type == "T" and self.last_move_rotation and(
-            not(self.last_figure.pos[0] < 0 and 
-                self.last_figure.pos[0] > self.grid_dims[0])):
-            
-            t_origin = V(self.last_figure.pos)
-            corner_pos = [t_origin,
-                          t_origin+V(2,0),
-                          t_origin+V(2,2),
-                          t_origin+V(0,2)]
-            
-            facing_corner_pos = [corner_pos[self.last_figure.rotation],
-                                 corner_pos[int((self.last_figure.rotation+1)%4)]]
-            
-            block_list = self.get_blocks(True)
+        score_pos = V(self.rect.right,
+                      self.rect.top+16*3*len(self.next_figures))
+        self.score.update(dt,window,fonts,score_pos)
 
-            active_corners = 0
-            facing_corners = 0
-
-            for b in block_list:
-                if b in corner_pos:
-                    active_corners += 1
-                if b in facing_corner_pos:
-                    facing_corners += 1
-            
-            if active_corners >= 3:
-                if facing_corners == 2:
-                    #t spin mini
-                    self.score.score_spin(len(self.scored_lines),True)
-                else:
-                    #t spin 
-                    self.score.score_spin(len(self.scored_lines),False)
-        elif len(self.scored_lines)>0:
-            self.score.score_lines(len(self.scored_lines))
+    def animation_length(self):
+        # Length of the line clear animation in seconds
 
-        
-        # Delete blocks in full rows
-        for row_num in self.scored_lines:
-            del self.block_dict[row_num]
-            for i in range(row_num,-1,-1):
-                if i in self.block_dict.keys():
-                    for block in self.block_dict[i]:
-                        block.pos += V(0,1)
+        column_delay = self.clear_cell_time*self.clear_cell_offset
+        return self.clear_cell_time + column_delay*(self.grid_dims[0]-1)
 
-        # Update rows dictionary if blocks have moved
-        self.update_rows()
-        self.scored_lines = []
+    def animate_scoring(self,styles,sprites):
+        # Get draws of the line clear animation
 
-    def animate_scoring(self,dt,window,styles,sprites):
-        self.animate_time += dt
+        draws = []
+        animate_time = self.engine.clear_time + self.render_time()
 
         score_anim = styles.get_score_anim()
         anim_len = len(score_anim)
 
-        delay = 0.6/anim_len
-        single_delay = delay * anim_len
-        offset = 0.02
-        max_delay_all = (single_delay * offset) * self.grid_dims[0]
+        single_delay = self.clear_cell_time
+        offset = self.clear_cell_offset
 
         start_time = 0
+        sprite_index = 0
         
         for x in range(int(self.grid_dims[0])):
 
             end_time = start_time + single_delay
-            
-            
 
-
-            if self.animate_time < start_time:
-                for row in self.scored_lines:
+            if animate_time < start_time:
+                for row in self.engine.scored_lines:
                     
                     block_rect = pg.Rect(V(self.rect.topleft)+V(x*16,row*16),
                                 V(16,16))
                     sprite = sprites.get_image(score_anim[sprite_index])
-                    window.blit(sprite,block_rect)
+                    draws.append((sprite,block_rect))
 
-            elif self.animate_time < end_time:
-                t = (self.animate_time-start_time)/single_delay
+            elif animate_time < end_time:
+                t = (animate_time-start_time)/single_delay
                 sprite_index = int(easing.lerp(t,0,anim_len))
                 sprite_index = min(sprite_index,anim_len-1)               
                 
-                for row in self.scored_lines:
+                for row in self.engine.scored_lines:
                     
                     block_rect = pg.Rect(V(self.rect.topleft)+V(x*16,row*16),
                                 V(16,16))
                     sprite = sprites.get_image(score_anim[sprite_index])
-                    window.blit(sprite,block_rect)
+                    draws.append((sprite,block_rect))
             
             start_time += single_delay*offset
 
-                
-                    
-        if self.animate_time >= end_time:
-            self.score_lines()
-            self.animate_time = 0
+        return draws
 
-    def update_rows(self):
-        #moves blocks to their proper row in block_dict
+    def update_stack(self,window,sprites):
+        # Draw rows of the engine's board that changed onto stack_surf
 
-        block_list = self.get_blocks()
+        game = self.engine
+        board = game.board
 
-        self.block_dict = {}
+        #The board only changes when a piece locks, lines are cleared or
+        #a new game starts
+        state = (board,game.pieces_placed,len(game.scored_lines))
+        if state == self.stack_state:
+            return
+        self.stack_state = state
 
-        for block in block_list:
-            row_num = int(block.pos[1])
-            if row_num not in self.block_dict.keys():
-                self.block_dict[row_num] = []
-            self.block_dict[row_num].append(block)
-        
-    def update(self,dt,window,styles,events,sprites,fonts):
-        fill_surf = pg.Surface(self.rect.size)
-        fill_surf.fill((0,0,10))
-        window.blit(fill_surf,self.rect)
+        #Rows being cleared are left empty for the animation
+        empty_row = board.empty_row
+        changed = False
 
-        if len(self.scored_lines) == 0:
-            self.update_input(dt,events,styles)
-            self.update_gravity(dt,events,styles)
+        for (y,drawn) in enumerate(self.stack_rows):
+            row = board.row(y)
+            if y in game.scored_lines:
+                row = empty_row
+            if row == drawn:
+                continue
 
-            
-            
-            self.active_figure.ghost(window,sprites,self.rect.topleft,self.ghost_pos)
-            self.active_figure.update(window,sprites,self.rect.topleft)
-        else:
-            self.animate_scoring(dt,window,styles,sprites)
+            changed = True
+            row_rect = pg.Rect(0,y*16,self.rect.width,16)
+            self.stack_surf.fill(self.background,row_rect)
 
-        for (row,blocks) in self.block_dict.items():
-                if row not in self.scored_lines:
-                    for block in blocks:
-                        block.update(window,sprites,self.rect.topleft)
+            for (x,sprite_id) in enumerate(row):
+                if sprite_id != 0:
+                    self.stack_surf.blit(sprites.get_image(sprite_id),
+                                         (x*16,y*16))
+            drawn[:] = row
 
-        self.draw_widgets(dt,window,sprites,fonts)
+        if changed:
+            window.surface_changed(self.stack_surf)
 
+    def render_time(self):
+        # Time since the last step, to draw timed things between steps
+        return self.stepper.alpha*self.stepper.tick
 
+    def step(self,inputs):
+        # Run one fixed step of the engine
 
-class Score:
-    def __init__(self) -> None:
-        self.score = 0
+        game = self.engine
+        if self.player is not None:
+            inputs = self.player.update(self.stepper.tick,game)
 
-        self.single = 100
-        self.double = 300
-        self.triple = 500
-        self.quad = 800
+        if game.game_over:
+            if inputs.key_pressed("enter"):
+                game.reset()
+                self.figures = {}
+        else:
+            game.step(inputs,self.stepper.tick)
 
-        self.m_spin_single = 200
-        self.m_spin_double = 400
+    def update(self,dt,window,styles,events,sprites,fonts):
+        game = self.engine
+        animating = len(game.scored_lines) > 0
+        was_over = game.game_over
 
-        self.spin_single = 800
-        self.spin_double = 1200
-        self.spin_triple = 1600
+        self.stepper.advance(dt,events,self.step)
 
-        self.combo_score = 50
+        if not animating and not (was_over and game.game_over):
+            self.update_figures(styles)
 
-        self.pending_scores = []
-        self.pending_timer = 0
-        self.pending_timer_max = 4
+        #Every block is drawn in one call, starting with the stack as it
+        #has the board's background
+        self.update_stack(window,sprites)
+        draws = [(self.stack_surf,self.rect)]
 
-        self.level = 1
-        self.combo = 0
+        if len(game.scored_lines) > 0:
+            draws += self.animate_scoring(styles,sprites)
 
+        #Pieces are hidden while lines clear, the ghost is out of date on
+        #the frame clearing ends
+        elif not animating and not game.game_over:
+            self.active_figure.update_block_pos()
+            draws += self.active_figure.get_ghost_draws(sprites,
+                                                        self.rect.topleft,
+                                                        self.ghost_pos)
+            draws += self.active_figure.get_draws(sprites,self.rect.topleft)
 
-    def score_lines(self,lines):
-        """Score a normal line from 1 to 4"""
+        draws += self.get_widget_draws(sprites)
+        window.blits(draws)
 
-        score_add = 0
+        self.draw_score(dt,window,fonts)
 
-        match lines:
-            case 1:
-                score_add = self.single
-            case 2:
-                score_add = self.double
-            case 3:
-                score_add = self.triple
-            case 4:
-                score_add = self.quad
-        
-        score_add = score_add * self.level
-        self.pending_scores.append(score_add)
-    
-    def score_spin(self,lines,t_spin_mini=False):
-        """Score a t-spin or mini t-spin"""
+        if game.game_over:
+            fonts.draw_font("GAME OVER",self.rect,window,center=True)
 
-        score_add = 0
 
-        if t_spin_mini:
-            match lines:
-                case 1:
-                    score_add = self.m_spin_single
-                case 2:
-                    score_add = self.m_spin_double
 
-        else:
-            match lines:
-                case 1:
-                    score_add = self.spin_single
-                case 2:
-                    score_add = self.spin_double
-                case 3:
-                    score_add = self.spin_triple
-        
-        score_add = score_add * self.level
-        self.pending_scores.append(score_add)
-    
-    def score_drop(self,cells,soft_drop=False):
-        if soft_drop:
-            self.pending_scores.append(int(cells))
-        else:
-            self.pending_scores.append(int(cells*2))
+class Score(engine.Score):
+    """
+    Draws the score from the engine's scoring rules, scores that have
+    been added are counted up one at a time
+    """
+
+    def __init__(self) -> None:
+        self.pending_timer_max = 4
+        super().__init__()
 
+    def reset(self):
+        super().reset()
+        self.pending_timer = 0
 
     def update(self,dt,window,fonts,offset=V(0,0)):
         font_height = fonts.char_dims[1]
@@ -528,12 +325,15 @@ class Score:
         animation_time_total = (self.pending_timer_max/
                                 (1+(len(self.pending_scores)/2)))
 
+        #Score before the pending scores were added
+        shown_score = self.score - sum(self.pending_scores)
+
         #Do animation with lerp using easing library
         if len(self.pending_scores) != 0:
             self.pending_timer += dt
             t = easing.ease_in_out_cubic(self.pending_timer/animation_time_total)
 
-            add_score = self.score + int(easing.lerp(t,0,self.pending_scores[0]))
+            add_score = shown_score + int(easing.lerp(t,0,self.pending_scores[0]))
             fonts.draw_font(str(add_score),font_rect,window)
 
             for i,score in enumerate(self.pending_scores):
@@ -544,7 +344,7 @@ class Score:
                     fonts.draw_font(f"+{new_score}",font_rect,window)
 
                     if self.pending_timer >= animation_time_total:
-                        self.score += self.pending_scores.pop(0)
+                        self.pending_scores.pop(0)
                         self.pending_timer = 0
                 else:
                     fonts.draw_font(f"+{score}",font_rect,window)
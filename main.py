@@ -2,10 +2,11 @@
 
 import pygame as pg
 import configparser, json
+from collections import OrderedDict
 import timer as t
 import sprites as s
 import grid as g
-import figure,easing,ui
+import figure,easing,ui,bot,bundle
 
 V = pg.Vector2
 V3 = pg.Vector3
@@ -28,6 +29,31 @@ class Window:
         self.scale = None
         self.game_rect = None
 
+        #Surfaces already scaled by self.scale, keyed by the source
+        #surface and emptied when the scale changes
+        self.scale_cache = OrderedDict()
+        self.scale_cache_size = 1024
+        self.scale_cache_hits = 0
+        self.scale_cache_misses = 0
+
+        #"framebuffer" draws everything unscaled onto game_surf which is
+        #scaled onto the display once a frame, "scaled" scales every
+        #surface as it is drawn straight onto the display
+        self.render_mode = "framebuffer"
+        self.game_surf = pg.Surface(self.game_dims)
+        self.game_fill = V3(0,0,80)
+
+        #Dirty rect tracking, every blit of a frame is recorded and only
+        #areas where this frame's blits differ from the last frame's are
+        #sent to the display. The whole display is flipped when more
+        #than dirty_limit of the game area changed
+        self.track_dirty = True
+        self.dirty_limit = 0.5
+        self.draws = []
+        self.last_draws = []
+        self.changed_surfs = set()
+        self.full_update = True
+
         #Variables used to access the display surface and it's state
         self.window = pg.display.set_mode(self.window_dims)
         self.mode = None
@@ -45,6 +71,9 @@ class Window:
 
         #Get first delta time from clock to avoid any zero division
         self.update()
+
+        #The first frame drawn fills the whole display
+        self.full_update = True
     
     def update_scale(self):
         """
@@ -56,8 +85,16 @@ class Window:
         window_surf_size = self.window.get_size()
 
         #Calculate int scale to fit game dimensions into window dimensions
+        old_scale = self.scale
         self.scale = min(window_surf_size[0]//self.game_dims[0],
                          window_surf_size[1]//self.game_dims[1])
+
+        #Scaled surfaces can't be reused at a new scale
+        if self.scale != old_scale:
+            self.scale_cache.clear()
+
+        #Everything moves when the window changes
+        self.full_update = True
         
         #Create new game rect using new scale and center it
         self.game_rect = pg.Rect(V(0),self.game_dims * self.scale)
@@ -108,6 +145,47 @@ class Window:
         #Update scale as window dimensions might have changed
         self.update_scale()
 
+    def scale_surface(self,surf):
+        """
+        Scales a surface by the scale attribute, reusing the scaled
+        surface from earlier calls with the same source surface. The
+        scaled copy keeps the alpha the source had when it was scaled,
+        call surface_changed after changing a source
+
+        Parameters:
+        surf(pg.Surface): Surface to be scaled
+
+        Returns
+        pg.Surface: Scaled Surface
+        """
+
+        scaled = self.scale_cache.get(surf)
+
+        if scaled is None:
+            self.scale_cache_misses += 1
+            scaled = pg.transform.scale_by(surf,self.scale)
+
+            self.scale_cache[surf] = scaled
+            if len(self.scale_cache) > self.scale_cache_size:
+                self.scale_cache.popitem(last=False)
+        else:
+            self.scale_cache_hits += 1
+            self.scale_cache.move_to_end(surf)
+
+        return scaled
+
+    def surface_changed(self,surf):
+        """
+        Forgets the scaled copy of a surface, use after drawing onto a
+        surface that is blitted to the window more than once
+
+        Parameters:
+        surf(pg.Surface): Surface that was drawn onto
+        """
+
+        self.scale_cache.pop(surf,None)
+        self.changed_surfs.add(surf)
+
     def blit(self,surf,dest,offset=V(0,0),scale_rect=True,special_flags=0):
         """
         Shorthand for drawing to the window, also scaled to draw to
@@ -123,27 +201,119 @@ class Window:
 
         """
 
+        #Draw unscaled onto the game surface in framebuffer mode
+        if scale_rect and self.render_mode == "framebuffer":
+            rect = self.game_surf.blit(surf,dest,None,special_flags)
+            self.add_draw(surf,dest,rect,special_flags)
+            return
+
         #Scale the surface and rect based on scale_rect
         if scale_rect:
-            surf = pg.transform.scale_by(surf,self.scale)
+            surf = self.scale_surface(surf)
             dest = self.scale_rect(dest)
 
         #Draw surface to window
-        self.window.blit(surf,dest,None,special_flags)
+        rect = self.window.blit(surf,dest,None,special_flags)
+
+        #Draws outside game_surf can't be compared with it
+        if self.render_mode == "framebuffer":
+            self.full_update = True
+        else:
+            self.add_draw(surf,dest,rect,special_flags)
     
+    def blits(self,blit_list):
+        """
+        Draws many surfaces in one call, the same as blit for each one
+
+        Parameters:
+        blit_list(list): (surface,rect) pairs, the rects are scaled
+        """
+
+        if self.render_mode == "framebuffer":
+            rects = self.game_surf.blits(blit_list)
+        else:
+            blit_list = [(self.scale_surface(surf),self.scale_rect(dest))
+                         for (surf,dest) in blit_list]
+            rects = self.window.blits(blit_list)
+
+        for ((surf,dest),rect) in zip(blit_list,rects):
+            self.add_draw(surf,dest,rect)
+
     def blit_precise(self,surf,topleft,size):
         """draw scaled image precisely, as scaled rects are int only"""
 
+        if self.render_mode == "framebuffer":
+            rect = self.game_surf.blit(surf,topleft)
+            self.add_draw(surf,topleft,rect)
+            return
+
         topleft *= self.scale
         topleft += self.game_rect.topleft
 
         size *=self.scale
 
-        surf = pg.transform.scale_by(surf,self.scale)
+        surf = self.scale_surface(surf)
         rect = pg.Rect(topleft,size)
 
 
-        self.window.blit(surf,rect)
+        rect = self.window.blit(surf,rect)
+        self.add_draw(surf,topleft,rect)
+
+    def add_draw(self,surf,dest,rect,special_flags=0):
+        # Record a blit for dirty rect tracking. Blits are compared by
+        # where they were asked to go and the size of the surface, as
+        # the rect drawn to is clipped and can stay the same when a
+        # surface moves partly outside the target. Positions are whole
+        # pixels as blits truncate them
+
+        if self.track_dirty:
+            if isinstance(dest,pg.Rect):
+                pos = dest.topleft
+            else:
+                pos = (int(dest[0]),int(dest[1]))
+
+            self.draws.append((surf,pos+surf.get_size(),tuple(rect),
+                               special_flags))
+
+    def get_dirty_rects(self):
+        """
+        Compares the blits of this frame with the last frame
+
+        Returns:
+        list: rects that changed, in game_surf coordinates in framebuffer
+        mode and display coordinates otherwise, or None if the whole
+        display should be updated
+        """
+
+        if self.full_update or not self.track_dirty:
+            return None
+
+        if self.draws == self.last_draws and len(self.changed_surfs) == 0:
+            return []
+
+        #Blits that were added or removed changed their area, blits of
+        #surfaces that were drawn onto changed too
+        new_draws = set(self.draws)
+        old_draws = set(self.last_draws)
+
+        #The same blits in a new order could cover each other differently
+        if new_draws == old_draws and len(self.changed_surfs) == 0:
+            return None
+
+        dirty_rects = [pg.Rect(rect) for (_,_,rect,_) in new_draws ^ old_draws]
+        dirty_rects += [pg.Rect(rect) for (surf,_,rect,_) in new_draws
+                        if surf in self.changed_surfs]
+
+        if self.render_mode == "framebuffer":
+            limit_area = self.game_surf.get_width()*self.game_surf.get_height()
+        else:
+            limit_area = self.game_rect.width*self.game_rect.height
+
+        dirty_area = sum(r.width*r.height for r in dirty_rects)
+        if dirty_area > limit_area*self.dirty_limit:
+            return None
+
+        return dirty_rects
 
     def fill_corners(self):
         # Fill in corners of game window
@@ -161,6 +331,41 @@ class Window:
         self.window.fill(V3(0,0,0),pg.Rect((0,self.window.get_height()-top_dims[1])
                                            ,top_dims))
     
+    def present(self,rects=None):
+        """
+        Scales the game surface onto the game rect of the display
+
+        Parameters:
+        rects(list): areas of game_surf to scale, None for all of it
+
+        Returns:
+        list: areas of the display that were drawn to
+        """
+
+        #Window is too small to fit the game
+        if self.scale < 1:
+            return []
+
+        if rects is None:
+            rects = [self.game_surf.get_rect()]
+
+        display_rects = []
+        for rect in rects:
+            display_rect = self.scale_rect(rect)
+            if display_rect.width == 0 or display_rect.height == 0:
+                continue
+
+            game_area = self.window.subsurface(display_rect)
+            source = self.game_surf.subsurface(rect)
+
+            if self.scale == 1:
+                game_area.blit(source,(0,0))
+            else:
+                pg.transform.scale(source,display_rect.size,game_area)
+            display_rects.append(display_rect)
+
+        return display_rects
+
     def update(self):
         """Updates dt and flips display as well as filling the background"""
 
@@ -168,12 +373,30 @@ class Window:
         if self.dt > 1:
             self.dt = 1/60
 
-        self.fill_corners()
+        dirty_rects = self.get_dirty_rects()
 
-        pg.display.flip()
+        if self.render_mode == "framebuffer":
+            display_rects = self.present(dirty_rects)
+        else:
+            display_rects = dirty_rects
 
-        self.window.fill(V3(0,0,0))
-        self.window.fill(V3(0,0,80),self.game_rect)
+        #Only send areas that changed to the display when few did
+        if dirty_rects is None:
+            self.fill_corners()
+            pg.display.flip()
+        elif len(display_rects) > 0:
+            pg.display.update(display_rects)
+
+        self.last_draws = self.draws
+        self.draws = []
+        self.changed_surfs.clear()
+        self.full_update = False
+
+        if self.render_mode == "framebuffer":
+            self.game_surf.fill(self.game_fill)
+        else:
+            self.window.fill(V3(0,0,0))
+            self.window.fill(self.game_fill,self.game_rect)
 
     
 
@@ -200,6 +423,7 @@ class Events:
                         "rotate_anti_clock":["z",
                                              "right control",
                                              "left control"],
+                        "rotate_180":["x"],
                         "hard_drop":["space","1"],
                         "hold_block":["c",
                                       "right shift",
@@ -210,12 +434,13 @@ class Events:
         self.mouse_up = False
         self.mouse_focus = False
     
-    def update(self,dt):
+    def update(self,dt,window):
         """
         Reads pygame events to get pressed/held keys
 
         Parameters:
         dt (float): delta time in seconds, obtained from window class
+        window (Window): window to rescale when it is resized
         """
 
         # Reset pressed keys every frame, pressed keys are active for
@@ -410,17 +635,41 @@ class Keybinds(Preferences):
     
 
 class Scenes:
-    def __init__(self) -> None:
+    def __init__(self,window,styles,assets) -> None:
+        """
+        Parameters:
+        window(Window): window the scenes are drawn to
+        styles(Styles): styles used by grids
+        assets(AssetLoader): loader shown by the loading scene
+        """
+
+        self.window = window
+        self.styles = styles
+        self.assets = assets
+
         self.scenes = {"main_menu":self.main_menu,
                        "game":self.game,
                        "options":self.options,
+                       "demo":self.demo,
+                       "loading":self.loading,
                        }
-        self.current_scene = "main_menu"
+        self.current_scene = "loading"
 
-        self.grid = g.Grid(window,styles)
+        # Progress bar shown while assets load, filled again when the
+        # progress changes
+        self.loading_bar = pg.Surface((200,6)).convert()
+        self.loading_shown = None
+
+        # Grids are made when they are first shown
+        self._grid = None
+
+        # Grid played by the bot in demo mode
+        self.demo_grid = None
+        self.bot = bot.Bot()
 
         self.menu_buttons = ui.Button_List({"play":"play",
                                             "options":"options",
+                                            "demo":"watch demo",
                                             "credits":"credits",
                                             "quit":"quit game"},
                                            pg.Rect(0,0,180,100),
@@ -449,6 +698,31 @@ class Scenes:
                                            list(range(0,101,10)))
 
 
+    @property
+    def grid(self):
+        if self._grid is None:
+            self._grid = g.Grid(self.window,self.styles)
+        return self._grid
+
+    def loading(self,dt,window,styles,events,sprites,fonts):
+        progress = self.assets.progress
+
+        if progress != self.loading_shown:
+            self.loading_shown = progress
+            self.loading_bar.fill((40,40,60))
+            self.loading_bar.fill((255,255,255),
+                                  pg.Rect(0,0,int(200*progress),6))
+            window.surface_changed(self.loading_bar)
+
+        bar_rect = self.loading_bar.get_rect(center=window.game_dims/2)
+        text_rect = pg.Rect(0,bar_rect.top-18,window.game_dims[0],9)
+
+        fonts.draw_font("loading",text_rect,window,center=True)
+        window.blit(self.loading_bar,bar_rect)
+
+        if self.assets.done:
+            self.current_scene = "main_menu"
+
     def game(self,dt,window,styles,events,sprites,fonts):
         self.grid.update(dt,window,styles,events,sprites,fonts)
 
@@ -460,9 +734,22 @@ class Scenes:
                 self.current_scene = "game"
             case "options":
                 self.current_scene = "options"
+            case "demo":
+                self.current_scene = "demo"
             case "quit":
                 quit()
     
+    def demo(self,dt,window,styles,events,sprites,fonts):
+        # The bot gives inputs in place of events
+        if self.demo_grid is None:
+            self.demo_grid = g.Grid(window,styles)
+            self.demo_grid.player = self.bot
+
+        self.demo_grid.update(dt,window,styles,events,sprites,fonts)
+
+        if events.key_pressed("pause"):
+            self.current_scene = "main_menu"
+
     def options(self,dt,window,styles,events,sprites,fonts):
         self.option_buttons.update(dt,window,fonts,events)
 
@@ -478,31 +765,57 @@ class Scenes:
 
     
 
-pg.init()
+class App:
+    """
+    Sets up pygame, the window and assets and runs the game loop. Nothing
+    is opened until an App is made, so modules can be imported by tools
+    without a display
+    """
 
-window = Window()
-events = Events()
-timer = t.Timers()
-preferences = Preferences()
+    def __init__(self) -> None:
+        pg.init()
 
-sprites = s.Sprites()
-styles = s.Styles(sprites)
-fonts = s.Fonts()
+        self.window = Window()
+        self.events = Events()
+        self.timer = t.Timers()
+        self.preferences = Preferences()
 
-scenes = Scenes()
+        # Assets are read from the bundle when it has been built
+        self.asset_bundle = bundle.open_bundle()
 
-# Main game loop
-while True:
+        self.sprites = s.Sprites()
+        self.styles = s.Styles(self.sprites,self.asset_bundle)
+        self.fonts = s.Fonts(self.asset_bundle)
 
-    window.update()
-    events.update(window.dt)
-    timer.update(window.dt)
+        # Styles and fonts are decoded on worker threads while the loading
+        # scene is shown
+        self.assets = s.AssetLoader()
+        self.assets.load_styles(self.styles,self.sprites)
+        self.assets.load_fonts(self.fonts)
 
-    styles.draw_background(window.dt,window,sprites)
-    scenes.update(window.dt,window,styles,events,sprites,fonts)
+        self.scenes = Scenes(self.window,self.styles,self.assets)
 
-    
-    
+    def frame(self):
+        """Runs one frame of the game"""
+
+        window = self.window
+
+        window.update()
+        self.events.update(window.dt,window)
+        self.timer.update(window.dt)
+        self.assets.update()
+
+        if self.assets.done:
+            self.styles.draw_background(window.dt,window,self.sprites)
+        self.scenes.update(window.dt,window,self.styles,self.events,
+                           self.sprites,self.fonts)
+
+    def run(self):
+        """Runs the game loop until the game is closed"""
 
+        while True:
+            self.frame()
 
 
+if __name__ == "__main__":
+    App().run()
@@ -0,0 +1,195 @@
+#This module has precomputed integer tables for every tetrimino rotation
+#it doesn't use pygame so it can be shared by rendering and game logic
+
+#Tetrimino data based off the SRS - https://tetris.fandom.com/wiki/SRS
+
+PIECE_TYPES = ("I","O","J","L","S","Z","T")
+
+BASE_MINO_DATA = {
+    "I":((0,1),(1,1),(2,1),(3,1)),
+    "J":((0,0),(0,1),(1,1),(2,1)),
+    "L":((0,1),(1,1),(2,1),(2,0)),
+    "O":((1,0),(2,0),(1,1),(2,1)),
+    "S":((0,1),(1,1),(1,0),(2,0)),
+    "T":((1,0),(0,1),(1,1),(2,1)),
+    "Z":((0,0),(1,0),(1,1),(2,1)),
+}
+
+#Width of the box each tetrimino rotates in
+BOX_SIZE = {"I":4,"J":3,"L":3,"O":4,"S":3,"T":3,"Z":3}
+
+#Largest x offset a tetrimino box can have to the left of the board
+X_MARGIN = 3
+
+
+def rotate_cells(cells,size):
+    """
+    Rotates cells 90 degrees clockwise inside a size x size box
+
+    Parameters:
+    cells(tuple): tuple of (x,y) int cell offsets
+    size(int): width of the rotation box
+
+    Returns:
+    tuple: rotated (x,y) cell offsets in the same order
+    """
+
+    #Rotating around the center of the box swaps x and y and mirrors
+    #the new x, which stays on whole numbers for both 3 and 4 wide boxes
+    return tuple((size-1-y,x) for (x,y) in cells)
+
+
+def row_masks(cells):
+    """
+    Packs cells into (row offset, bitmask) pairs, bit x is set if
+    column x of the row is part of the tetrimino
+    """
+
+    masks = {}
+    for (x,y) in cells:
+        masks[y] = masks.get(y,0) | (1 << x)
+    return tuple(sorted(masks.items()))
+
+
+def bounds(cells):
+    """Returns (min_x,min_y,max_x,max_y) of cells"""
+
+    xs = [x for (x,_) in cells]
+    ys = [y for (_,y) in cells]
+    return (min(xs),min(ys),max(xs),max(ys))
+
+
+def lowest_cells(cells):
+    """Returns (x,y) pairs of the lowest cell in each column of cells"""
+
+    lowest = {}
+    for (x,y) in cells:
+        lowest[x] = max(lowest.get(x,y),y)
+    return tuple(sorted(lowest.items()))
+
+
+#Create tetrimino rotation data
+#(To avoid having to write it out manually)
+
+#CELLS[type][rotation] is a tuple of 4 (x,y) offsets from figure position
+CELLS = {}
+
+for (mino,data) in BASE_MINO_DATA.items():
+    rotations = [data]
+
+    #O is the same in every rotation
+    for _ in range(3):
+        if mino == "O":
+            rotations.append(data)
+        else:
+            rotations.append(rotate_cells(rotations[-1],BOX_SIZE[mino]))
+
+    CELLS[mino] = tuple(rotations)
+
+#Data derived from CELLS for each type and rotation
+ROW_MASKS = {mino:tuple(map(row_masks,rots)) for (mino,rots) in CELLS.items()}
+BOUNDS = {mino:tuple(map(bounds,rots)) for (mino,rots) in CELLS.items()}
+LOWEST = {mino:tuple(map(lowest_cells,rots)) for (mino,rots) in CELLS.items()}
+
+
+def shift_mask(mask,x):
+    """Moves a row mask x columns to the right, left if x is negative"""
+
+    if x >= 0:
+        return mask << x
+    return mask >> -x
+
+
+def shifted_row_masks(width):
+    """
+    Builds row masks of every tetrimino already shifted to each column
+
+    Parameters:
+    width(int): number of columns on the board
+
+    Returns:
+    dict: table[type][rot][x+X_MARGIN] is a tuple of (row offset,mask)
+    pairs, or None if the tetrimino is outside the board at x
+    """
+
+    table = {}
+    for mino in PIECE_TYPES:
+        rotations = []
+        for rot in range(4):
+            (min_x,_,max_x,_) = BOUNDS[mino][rot]
+            columns = []
+
+            for x in range(-X_MARGIN,width+1):
+                if x + min_x < 0 or x + max_x >= width:
+                    columns.append(None)
+                else:
+                    columns.append(tuple((dy,shift_mask(mask,x))
+                                         for (dy,mask) in ROW_MASKS[mino][rot]))
+
+            rotations.append(tuple(columns))
+        table[mino] = tuple(rotations)
+
+    return table
+
+
+def fits(board_masks,width,mino,rotation,x,y):
+    """
+    Checks if a tetrimino fits on a bitboard
+
+    Parameters:
+    board_masks(list): one int per row, bit x set if column x is filled
+    width(int): number of columns on the board
+    mino(str): tetrimino type
+    rotation(int): rotation from 0 to 3
+    x(int),y(int): position of the tetrimino on the board
+
+    Returns:
+    bool: True if the tetrimino is inside the board and not overlapping
+    """
+
+    (min_x,_,max_x,max_y) = BOUNDS[mino][rotation]
+    if x + min_x < 0 or x + max_x >= width or y + max_y >= len(board_masks):
+        return False
+
+    for (dy,mask) in ROW_MASKS[mino][rotation]:
+        row = y + dy
+
+        #Rows above the board are always empty
+        if row < 0:
+            continue
+
+        if board_masks[row] & shift_mask(mask,x):
+            return False
+
+    return True
+
+
+def drop_distance(board_masks,mino,rotation,x,y):
+    """
+    Gets how many rows a tetrimino can fall before landing, the
+    tetrimino must already be in a valid position
+
+    Parameters:
+    board_masks(list): one int per row, bit x set if column x is filled
+    mino(str): tetrimino type
+    rotation(int): rotation from 0 to 3
+    x(int),y(int): position of the tetrimino on the board
+
+    Returns:
+    int: number of rows the tetrimino can move down
+    """
+
+    height = len(board_masks)
+    distance = height
+
+    #Only the lowest cell of each column can land on something
+    for (dx,dy) in LOWEST[mino][rotation]:
+        bit = 1 << (x + dx)
+        row = max(y + dy + 1,0)
+
+        while row < height and not board_masks[row] & bit:
+            row += 1
+
+        distance = min(distance,row - (y + dy) - 1)
+
+    return distance
@@ -0,0 +1,117 @@
+#This module has randomizers, which decide the order tetriminos come in.
+#Each one has its own seeded random generator so games can be replayed,
+#it doesn't use pygame
+
+import random
+from abc import ABC,abstractmethod
+from collections import deque
+import pieces
+
+
+class Randomizer(ABC):
+    """
+    Base class for randomizers, iterating over one gives tetrimino types
+    forever
+    """
+
+    name = None
+
+    def __init__(self,seed=None) -> None:
+        """
+        Parameters:
+        seed: seed for the random generator, None for a random order
+        """
+
+        self.random = random.Random(seed)
+
+    def __iter__(self):
+        return self
+
+    @abstractmethod
+    def __next__(self):
+        """Gets the next tetrimino type"""
+
+
+class Bag(Randomizer):
+    """
+    Every tetrimino is put in a bag which is shuffled and emptied before
+    a new bag is made
+    """
+
+    name = "7-bag"
+    copies = 1
+
+    def __init__(self,seed=None) -> None:
+        super().__init__(seed)
+        self.bag = deque()
+
+    def __next__(self):
+        if len(self.bag) == 0:
+            new_bag = list(pieces.PIECE_TYPES) * self.copies
+            self.random.shuffle(new_bag)
+            self.bag.extend(new_bag)
+
+        return self.bag.popleft()
+
+
+class Bag14(Bag):
+    """A bag with two of every tetrimino"""
+
+    name = "14-bag"
+    copies = 2
+
+
+class Memoryless(Randomizer):
+    """Every tetrimino is picked at random, like classic Tetris"""
+
+    name = "memoryless"
+
+    def __next__(self):
+        return self.random.choice(pieces.PIECE_TYPES)
+
+
+class History(Randomizer):
+    """
+    TGM style randomizer, rerolls a few times if the tetrimino was one
+    of the last four, and never starts with S, Z or O
+    """
+
+    name = "tgm"
+    rolls = 6
+    first_pieces = ("I","J","L","T")
+
+    def __init__(self,seed=None) -> None:
+        super().__init__(seed)
+        self.history = deque(("Z","S","S","Z"),maxlen=4)
+        self.first = True
+
+    def __next__(self):
+        if self.first:
+            self.first = False
+            mino = self.random.choice(self.first_pieces)
+        else:
+            for _ in range(self.rolls):
+                mino = self.random.choice(pieces.PIECE_TYPES)
+                if mino not in self.history:
+                    break
+
+        self.history.append(mino)
+        return mino
+
+
+RANDOMIZERS = {r.name:r for r in (Bag,Bag14,Memoryless,History)}
+
+
+def get_randomizer(name,seed=None):
+    """
+    Creates a randomizer by name
+
+    Parameters:
+    name(str): name of randomizer (7-bag, 14-bag, memoryless, tgm)
+    seed: seed for the random generator
+    """
+
+    if name not in RANDOMIZERS.keys():
+        raise ValueError(f"{name} is not the name of a randomizer")
+
+    return RANDOMIZERS[name](seed)
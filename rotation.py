@@ -0,0 +1,164 @@
+#This module has rotation systems, which decide the translations tried
+#when a tetrimino is rotated, it doesn't use pygame
+
+"""
+Wallkicks are when a tetrimino is rotated but might be inside a placed
+block on the grid, a series of translations are tried and if none are
+valid no rotation takes place
+
+Kick data is compiled into tuples indexed by [kick class][from][to],
+with rotations from 0 to 3 with 0 being the starting rotation and 3 being
+the starting rotation rotated 3 times clockwise. Every list of kicks
+starts with (0,0) so a rotation is just a loop over the translations
+
+Kick translations are written here the same way as the SRS wiki, where
+positive y is up, and flipped when compiled as the grid's y goes down
+
+https://tetris.fandom.com/wiki/SRS
+"""
+
+#Kick class of each tetrimino, all tetriminos apart from I share kicks
+#and O never needs to kick
+KICK_CLASS = {"I":1,"O":2,"J":0,"L":0,"S":0,"T":0,"Z":0}
+KICK_CLASSES = 3
+
+SRS_KICKS = {
+    (0,1):((-1,0),(-1,1),(0,-2),(-1,-2)),
+    (1,0):((1,0),(1,-1),(0,2),(1,2)),
+
+    (1,2):((1,0),(1,-1),(0,2),(1,2)),
+    (2,1):((-1,0),(-1,1),(0,-2),(-1,-2)),
+
+    (2,3):((1,0),(1,1),(0,-2),(1,-2)),
+    (3,2):((-1,0),(-1,-1),(0,2),(-1,2)),
+
+    (3,0):((-1,0),(-1,-1),(0,2),(-1,2)),
+    (0,3):((1,0),(1,1),(0,-2),(1,-2)),
+}
+
+SRS_KICKS_I = {
+    (0,1):((-2,0),(1,0),(-2,-1),(1,2)),
+    (1,0):((2,0),(-1,0),(2,1),(-1,-2)),
+
+    (1,2):((-1,0),(2,0),(-1,2),(2,-1)),
+    (2,1):((1,0),(-2,0),(1,-2),(-2,1)),
+
+    (2,3):((2,0),(-1,0),(2,1),(-1,-2)),
+    (3,2):((-2,0),(1,0),(-2,-1),(1,2)),
+
+    (3,0):((1,0),(-2,0),(1,-2),(-2,1)),
+    (0,3):((-1,0),(2,0),(-1,2),(2,-1)),
+}
+
+#180 degree kicks used by SRS+
+SRS_PLUS_KICKS_180 = {
+    (0,2):((0,1),(1,1),(-1,1),(1,0),(-1,0)),
+    (2,0):((0,-1),(-1,-1),(1,-1),(-1,0),(1,0)),
+    (1,3):((1,0),(1,2),(1,1),(0,2),(0,1)),
+    (3,1):((-1,0),(-1,2),(-1,1),(0,2),(0,1)),
+}
+
+
+def compile_kicks(kick_data):
+    """
+    Compiles a dictionary of kicks into a 4x4 tuple of translations
+
+    Parameters:
+    kick_data(dict): (from,to) keys with wiki style translations, missing
+    keys only try rotating in place
+
+    Returns:
+    tuple: table[from][to] is a tuple of (x,y) translations in grid space
+    """
+
+    table = []
+    for origin in range(4):
+        row = []
+        for new in range(4):
+            kicks = ((0,0),)
+            for (x,y) in kick_data.get((origin,new),()):
+                kicks += ((x,-y),)
+            row.append(kicks)
+        table.append(tuple(row))
+
+    return tuple(table)
+
+
+class RotationSystem:
+    """
+    Base class for rotation systems, subclasses fill in kick_data with
+    one dictionary of kicks for each kick class
+    """
+
+    name = None
+    kick_data = ({},{},{})
+
+    def __init__(self) -> None:
+        #Compiled kicks for each kick class
+        self.table = tuple(compile_kicks(data) for data in self.kick_data)
+
+        #Table for each tetrimino type so rotating only indexes tuples
+        self.type_table = {mino:self.table[kick_class]
+                           for (mino,kick_class) in KICK_CLASS.items()}
+
+    def kicks(self,mino,origin,new):
+        """
+        Gets translations to try when rotating
+
+        Parameters:
+        mino(str): tetrimino type
+        origin(int): rotation before rotating
+        new(int): rotation after rotating
+
+        Returns:
+        tuple: (x,y) translations in the order they are tried
+        """
+
+        return self.type_table[mino][origin][new]
+
+
+class SRS(RotationSystem):
+    """The Super Rotation System used by modern Tetris games"""
+
+    name = "SRS"
+    kick_data = (SRS_KICKS,SRS_KICKS_I,{})
+
+
+class SRSPlus(RotationSystem):
+    """SRS with extra kicks for 180 degree rotations"""
+
+    name = "SRS+"
+    kick_data = ({**SRS_KICKS,**SRS_PLUS_KICKS_180},
+                 {**SRS_KICKS_I,**SRS_PLUS_KICKS_180},
+                 {})
+
+
+class ARS(RotationSystem):
+    """
+    Arika style kicks, tetriminos try one to the right then one to the
+    left and I never kicks. Rotation states are the same as SRS
+    """
+
+    name = "ARS"
+    kick_data = ({(origin,new):((1,0),(-1,0))
+                  for origin in range(4) for new in range(4)
+                  if origin != new},
+                 {},
+                 {})
+
+
+ROTATION_SYSTEMS = {system.name:system for system in (SRS,SRSPlus,ARS)}
+
+
+def get_system(name):
+    """
+    Creates a rotation system by name
+
+    Parameters:
+    name(str): name of rotation system (SRS, SRS+, ARS)
+    """
+
+    if name not in ROTATION_SYSTEMS.keys():
+        raise ValueError(f"{name} is not the name of a rotation system")
+
+    return ROTATION_SYSTEMS[name]()
@@ -0,0 +1,190 @@
+#This module finds every place a piece can lock on a board along with the
+#inputs needed to get it there, for bots, finesse and puzzle tools. It
+#doesn't use pygame
+
+from collections import OrderedDict,deque,namedtuple
+import pieces,rotation
+from pieces import X_MARGIN
+
+#A place a piece can lock, spin is True if the last move was a rotation
+#(only tracked for T) and path is a tuple of engine.ACTIONS ending in
+#hard_drop, "down" means down is held until the piece lands
+Placement = namedtuple("Placement",["x","y","rotation","spin","path"])
+
+#Empty/full rows added above/below the board while searching
+ROW_PADDING = 4
+
+#Actions that move sideways, with the change in x
+SHIFTS = (("left",-1),("right",1))
+
+#Actions that rotate, with the number of clockwise quarter turns
+ROTATIONS = (("rotate_clock",1),("rotate_anti_clock",-1),("rotate_180",2))
+
+
+class PlacementFinder:
+    """
+    Finds reachable placements with a breadth first search over
+    (x,y,rotation) states, results are cached by board and piece type
+    """
+
+    def __init__(self,width=10,height=22,rotation_system="SRS",
+                 spawn=(3,0),cache_size=4096) -> None:
+        """
+        Parameters:
+        width(int): number of columns on the board
+        height(int): number of rows on the board
+        rotation_system(str): name of rotation system (SRS, SRS+, ARS)
+        spawn(tuple): position pieces spawn at, like Engine.drop_pos
+        cache_size(int): number of searches kept in the cache
+        """
+
+        self.width = width
+        self.height = height
+        self.rotation_system = rotation.get_system(rotation_system)
+        self.spawn = spawn
+        self.table = pieces.shifted_row_masks(width)
+        self.lowest = pieces.LOWEST
+
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    def find(self,masks,mino):
+        """
+        Gets every placement of a piece on a board
+
+        Parameters:
+        masks(list): one int per row, bit x set if column x is filled
+        mino(str): tetrimino type
+
+        Returns:
+        tuple: Placement tuples, empty if the piece can't spawn
+        """
+
+        key = (tuple(masks),mino)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        placements = self.search(key[0],mino)
+
+        self.cache[key] = placements
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return placements
+
+    def find_for(self,game):
+        """Gets every placement of the active piece of an Engine"""
+        return self.find(game.board.masks,game.active.type)
+
+    def search(self,masks,mino):
+        #Breadth first search from the spawn position
+
+        columns = self.table[mino]
+        height = self.height
+        kicks = self.rotation_system.type_table[mino]
+        lowest = self.lowest[mino]
+        track_spin = mino == "T"
+
+        #Rows are padded with empty rows above and full rows below the
+        #board, so a collision test is the same everywhere
+        padded = [0]*ROW_PADDING + list(masks) + [-1]*ROW_PADDING
+
+        def fits(x,y,rot):
+            if x < -X_MARGIN or x > self.width:
+                return False
+            rows = columns[rot][x+X_MARGIN]
+            if rows is None:
+                return False
+            y += ROW_PADDING
+            for (dy,mask) in rows:
+                if padded[y+dy] & mask:
+                    return False
+            return True
+
+        #below[x][y] is the first filled row at or below y in column x,
+        #so drops only look at the lowest cell of each column
+        below = []
+        for column in range(self.width):
+            bit = 1 << column
+            rows = [height] * (height+1)
+            for row in range(height-1,-1,-1):
+                rows[row] = row if masks[row] & bit else rows[row+1]
+            below.append(rows)
+
+        (spawn_x,spawn_y) = self.spawn
+        if not fits(spawn_x,spawn_y,0):
+            return ()
+
+        start = (spawn_x,spawn_y,0,False)
+        parents = {start:None}
+        queue = deque([start])
+
+        #Landing state -> state it was hard dropped from
+        landings = {}
+
+        while queue:
+            state = queue.popleft()
+            (x,y,rot,spin) = state
+
+            # Distance to the floor from the lowest cell of each column
+            distance = height
+            for (dx,dy) in lowest[rot]:
+                row = y + dy + 1
+                if row < 0:
+                    row = 0
+                drop = below[x+dx][row] - y - dy - 1
+                if drop < distance:
+                    distance = drop
+
+            if distance > 0:
+                landing = (x,y+distance,rot,False)
+                if landing not in parents:
+                    parents[landing] = (state,"down")
+                    queue.append(landing)
+            else:
+                landing = state
+
+            if landing not in landings:
+                landings[landing] = state
+
+            for (action,move_x) in SHIFTS:
+                if fits(x+move_x,y,rot):
+                    new_state = (x+move_x,y,rot,False)
+                    if new_state not in parents:
+                        parents[new_state] = (state,action)
+                        queue.append(new_state)
+
+            for (action,turns) in ROTATIONS:
+                new_rot = (rot+turns)%4
+                for (kick_x,kick_y) in kicks[rot][new_rot]:
+                    if fits(x+kick_x,y+kick_y,new_rot):
+                        new_state = (x+kick_x,y+kick_y,new_rot,track_spin)
+                        if new_state not in parents:
+                            parents[new_state] = (state,action)
+                            queue.append(new_state)
+                        break
+
+        #Symmetric rotations can land on the same cells, only the best
+        #placement of each set of cells is kept
+        placements = {}
+        for (landing,state) in landings.items():
+            path = ["hard_drop"]
+            while parents[state] is not None:
+                (state,action) = parents[state]
+                path.append(action)
+            path.reverse()
+
+            (x,y,rot,spin) = landing
+            cells = tuple((y+dy,mask) for (dy,mask) in columns[rot][x+X_MARGIN])
+
+            # Spins score more, then shorter paths are better
+            old = placements.get(cells)
+            if old is None or (spin,-len(path)) > (old.spin,-len(old.path)):
+                placements[cells] = Placement(x,y,rot,spin,tuple(path))
+
+        return tuple(placements.values())
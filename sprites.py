@@ -1,18 +1,24 @@
 # This file contains classes that manage sprites
 
-import configparser,json,os
+import configparser,hashlib,json,os,tempfile,time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pygame as pg
 from random import shuffle
 import easing
 
 V = pg.Vector2
 
-SPRITE_DIR = "sprites/"
-SPRITESHEETS = [
-    "fonts/charmap-cellphone.png",
-    "fonts/charmap-futuristic.png",
-    "fonts/charmap-oldschool.png"
-]
+# Alpha values are rounded to a multiple of this so fades share variants
+ALPHA_STEP = 5
+
+# Width of atlas surfaces in pixels, wider tiles get a wider atlas
+ATLAS_WIDTH = 256
+
+# Folder for preprocessed assets, an asset is made again when the files
+# it was made from change or ASSET_CACHE_VERSION changes
+ASSET_CACHE_DIR = "user_data/cache/"
+ASSET_CACHE_VERSION = 2
 
 def split_spritesheet(surface,cell_dims):
     # Creates a list of subsurfaces from a spritesheet based on cell dims
@@ -39,6 +45,134 @@ def split_spritesheet(surface,cell_dims):
     return surface_list
 
 
+def pack_atlas(tiles):
+    """
+    Packs surfaces into one atlas surface in rows, tiles with the
+    same pixels are only packed once
+
+    Parameters:
+    tiles(list): surfaces to pack
+
+    Returns:
+    tuple: (atlas surface,rect of each tile as a list,pixel hash of
+    each tile), the atlas isn't converted so it can be made on any
+    thread
+    """
+
+    keys = []
+    new_tiles = {}
+
+    for tile in tiles:
+        (w,h) = tile.get_size()
+        pixels = hashlib.sha1(pg.image.tobytes(tile,"RGBA")).hexdigest()
+        key = f"{w}x{h}:{pixels}"
+
+        keys.append(key)
+        if key not in new_tiles.keys():
+            new_tiles[key] = tile
+
+    # Place tiles left to right in rows, tallest first
+    atlas_width = max([ATLAS_WIDTH]+[t.get_width()
+                                     for t in new_tiles.values()])
+    order = sorted(new_tiles.keys(),
+                   key=lambda k:-new_tiles[k].get_height())
+    positions = {}
+    (x,y,row_height) = (0,0,0)
+
+    for key in order:
+        (w,h) = new_tiles[key].get_size()
+        if x + w > atlas_width:
+            (x,y,row_height) = (0,y+row_height,0)
+        positions[key] = [x,y,w,h]
+        x += w
+        row_height = max(row_height,h)
+
+    atlas = pg.Surface((atlas_width,max(y+row_height,1)),pg.SRCALPHA)
+    atlas.blits([(new_tiles[key],pos[:2])
+                 for (key,pos) in positions.items()],False)
+
+    return (atlas,[positions[key] for key in keys],keys)
+
+
+def file_stamps(paths):
+    """
+    Gets the modification time and size of files, to tell if they
+    changed since an asset was made from them
+
+    Parameters:
+    paths(list): file paths
+
+    Returns:
+    dict: [modification time,size] keyed by path
+    """
+
+    stamps = {}
+    for path in paths:
+        stat = os.stat(path)
+        stamps[path] = [stat.st_mtime_ns,stat.st_size]
+    return stamps
+
+
+def load_cached(name,sources,build):
+    """
+    Loads a surface and data made from asset files from the asset cache
+    in one read, or builds them and saves them to the cache if the files
+    changed since they were cached
+
+    Parameters:
+    name(str): file name in the asset cache
+    sources(list): paths of files the asset is made from
+    build(function): takes no arguments and returns (surface,data)
+    where data can be saved as json
+
+    Returns:
+    tuple: (surface,data), the surface has RGBA pixels and isn't
+    converted
+    """
+
+    stamps = file_stamps(sources)
+    cache_path = os.path.join(ASSET_CACHE_DIR,name)
+
+    # The file is a line of json followed by the raw pixels
+    try:
+        with open(cache_path,"rb") as f:
+            (header,pixels) = f.read().split(b"\n",1)
+        header = json.loads(header)
+
+        if (header["version"] == ASSET_CACHE_VERSION and
+            header["sources"] == stamps):
+            surface = pg.image.frombytes(pixels,header["size"],"RGBA")
+            return (surface,header["data"])
+    except (OSError,ValueError,KeyError):
+        pass
+
+    (surface,data) = build()
+
+    header = {"version":ASSET_CACHE_VERSION,
+              "sources":stamps,
+              "size":surface.get_size(),
+              "data":data}
+
+    # The cache is written to a temporary file which then replaces the
+    # old one, so other threads never read a half written cache. The
+    # game still runs if the cache can't be written
+    try:
+        os.makedirs(ASSET_CACHE_DIR,exist_ok=True)
+        (fd,temp_path) = tempfile.mkstemp(dir=ASSET_CACHE_DIR)
+        try:
+            with os.fdopen(fd,"wb") as f:
+                f.write(json.dumps(header).encode() + b"\n" +
+                        pg.image.tobytes(surface,"RGBA"))
+            os.replace(temp_path,cache_path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+    except OSError:
+        pass
+
+    return (surface,data)
+
+
 
 class Font:
     """This class stores information about a Font"""
@@ -62,99 +196,180 @@ class Font:
 class Fonts:
     """This class stores and draws pixel perfect(i.e. pixelart) fonts"""
 
-    def __init__(self) -> None:
-        # Gets sprites for all 3 fonts and cuts up the spritesheets
+    def __init__(self,bundle=None) -> None:
+        # Fonts are loaded and cut up when they are first used, from the
+        # asset bundle if one is given
 
+        self.bundle = bundle
         self.path = "sprites/fonts/"
-        self.spritesheets= {
-            "cellphone":pg.image.load(self.path + "charmap-cellphone.png"),
-            "futuristic":pg.image.load(self.path + "charmap-futuristic.png"),
-            "oldschool":pg.image.load(self.path + "charmap-oldschool.png")
+        self.font_files = {
+            "cellphone":"charmap-cellphone.png",
+            "futuristic":"charmap-futuristic.png",
+            "oldschool":"charmap-oldschool.png"
         }
 
+        self.spritesheets = {}
         self.fonts = {}
 
+        # Futures of fonts being decoded by an AssetLoader, get_font
+        # waits for these rather than decoding the same font again
+        self.pending = {}
+
+        # Surfaces of laid out text keyed by (text,font,width,center),
+        # the oldest are removed when full
+        self.text_cache = OrderedDict()
+        self.text_cache_size = 256
+
         self.char_dims = V(7,9)
 
         # Create a list of every character in order in the font spritesheets
-        char_order = list(" !\"#$%&'()*+,-./0123456789:;<=>?"+
-                      r"@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\]^_"+
-                      "`abcdefghijklmnopqrstuvwxyz{}~")
-        
-        # Split up the spritesheets for each font
-        for (ss_name,spritesheet) in self.spritesheets.items():
-            self.fonts[ss_name] = Font(spritesheet,char_order,ss_name,V(7,9))
+        self.char_order = list(" !\"#$%&'()*+,-./0123456789:;<=>?"+
+                               r"@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\]^_"+
+                               "`abcdefghijklmnopqrstuvwxyz{}~")
 
-    def draw_font(self,text,rect,window,type="oldschool",center=False):        # Draws text within a rect
-        if type not in self.fonts.keys():
+    def get_font(self,type):
+        """
+        Gets a Font by name, loading it the first time
+
+        Parameters:
+        type(str): name of font
+        """
+
+        if type not in self.font_files.keys():
             raise ValueError("type parameter is not the name of a font")
 
-        
+        if type not in self.fonts.keys():
+            if type in self.pending.keys():
+                decoded = self.pending[type].result()
+            else:
+                decoded = self.decode_font(type)
+            self.finish_font(type,decoded)
 
-        draw_pos = V(rect.topleft)
-        word_list = list(text.split(" "))
-        line_list = []
+        return self.fonts[type]
 
-        font = self.fonts[type]
-        char_dims = font.char_dims
+    def decode_font(self,type):
+        # Load the spritesheet of a font, can be run on any thread
 
-        while len(word_list) > 0 or len(line_list) > 0:
+        if self.bundle is not None:
+            return (self.bundle.surface(self.bundle.fonts[type]),None)
 
-            draw_line = False
+        path = self.path + self.font_files[type]
+        build = lambda: (pg.image.load(path),None)
+        return load_cached(f"font-{type}",[path],build)
 
-            if len(word_list) > 0:
-                word = word_list[0]
-                word_dims = V(self.char_dims[0]*len(word),)
-                word_rect = pg.Rect(draw_pos,word_dims)
-                max_word_len = int(rect.width//char_dims[0])
+    def finish_font(self,type,decoded):
+        # Convert a decoded spritesheet and cut it up, on the main thread
 
-                
-                if rect.right < word_rect.right:
-                    draw_line = True
-            
-            if len(word_list) == 0:
-                draw_line = True
-
-            if draw_line:
-                line_rect = pg.Rect(V(0,draw_pos[1]),
-                                    V(len(" ".join(line_list))*char_dims[0],
-                                      char_dims[1]))
-
-                if center:
-                    line_rect.centerx = rect.centerx
-                else:
-                    line_rect.left = rect.left
-
-                draw_rect = pg.Rect(line_rect.topleft,char_dims)
-                for (i,w) in enumerate(line_list):
-
-                    for c in w:
-                        image = font.letter_images[c]
-                        window.blit(image,draw_rect)
-                        draw_rect.left += char_dims[0]
-                    
-                    if i < len(line_list)-1:
-                        draw_rect.left += char_dims[0]
-                
-                draw_pos = V(rect.topleft[0],draw_pos[1]+self.char_dims[1])
-                line_list = []
+        self.pending.pop(type,None)
+        if type in self.fonts.keys():
+            return
 
-            if len(word_list) > 0:
-                if max_word_len < len(word):
-                    # If word is too long for rect width, split it between
-                    # lines with a hyphen
+        # Bundled spritesheets are only read while text is laid out, so
+        # they are kept as views of the bundle's memory map
+        spritesheet = decoded[0]
+        if self.bundle is None:
+            spritesheet = spritesheet.convert_alpha()
+        self.spritesheets[type] = spritesheet
+        self.fonts[type] = Font(spritesheet,self.char_order,type,V(7,9))
 
-                    word_list = [word[max_word_len-1:]] + word_list
-                    word = word[:max_word_len-1]+"-"
+    def wrap(self,text,max_chars):
+        """
+        Splits text into lines of at most max_chars characters, words
+        too long for a line are split with a hyphen
 
-                line_list.append(word_list.pop(0))
+        Parameters:
+        text(str): text to split
+        max_chars(int): most characters in a line
 
-                # Draw letters to window
-                for _ in word:
-                    draw_pos = draw_pos + V(self.char_dims[0],0)
-                
-                if len(word_list) != 1 and word[-1:] != "-":
-                    draw_pos = draw_pos + V(self.char_dims[0],0)
+        Returns:
+        list: lines of text
+        """
+
+        max_chars = max(max_chars,2)
+        lines = []
+        line = ""
+
+        for word in text.split(" "):
+            # Fill lines with the start of a word that is too long
+            while len(word) > max_chars:
+                if line != "":
+                    lines.append(line)
+                    line = ""
+                lines.append(word[:max_chars-1]+"-")
+                word = word[max_chars-1:]
+
+            if line == "":
+                line = word
+            elif len(line)+1+len(word) <= max_chars:
+                line = line + " " + word
+            else:
+                lines.append(line)
+                line = word
+
+        lines.append(line)
+        return lines
+
+    def render(self,text,width,type="oldschool",center=False):
+        """
+        Gets a surface with text laid out in lines, surfaces are shared
+        so they must not be changed
+
+        Parameters:
+        text(str): text to draw
+        width(int): width of the area the text is wrapped to in pixels
+        type(str): name of font
+        center(bool): if lines are centered in the width
+
+        Returns:
+        pg.Surface: transparent surface with the text
+        """
+
+        key = (text,type,width,center)
+        surf = self.text_cache.get(key)
+        if surf is not None:
+            self.text_cache.move_to_end(key)
+            return surf
+
+        font = self.get_font(type)
+        (char_w,char_h) = (int(font.char_dims[0]),int(font.char_dims[1]))
+        lines = self.wrap(text,int(width//char_w))
+
+        line_width = max(len(line) for line in lines)*char_w
+        surf_width = max(width,line_width) if center else line_width
+        surf = pg.Surface((max(surf_width,1),len(lines)*char_h),pg.SRCALPHA)
+
+        blit_list = []
+        for (y,line) in enumerate(lines):
+            left = 0
+            if center:
+                left = width//2 - (len(line)*char_w)//2
+
+            for (x,c) in enumerate(line):
+                if c != " ":
+                    blit_list.append((font.letter_images[c],
+                                      (left+x*char_w,y*char_h)))
+        surf.blits(blit_list,False)
+
+        self.text_cache[key] = surf
+        if len(self.text_cache) > self.text_cache_size:
+            self.text_cache.popitem(last=False)
+
+        return surf
+
+    def draw_font(self,text,rect,window,type="oldschool",center=False):
+        """
+        Draws text wrapped within a rect
+
+        Parameters:
+        text(str): text to draw
+        rect(pg.Rect): area to draw in, text starts at the top
+        window(Window): window class
+        type(str): name of font
+        center(bool): if lines are centered in the rect
+        """
+
+        surf = self.render(text,rect.width,type,center)
+        window.blit(surf,pg.Rect(rect.topleft,surf.get_size()))
 
 
 
@@ -166,77 +381,103 @@ class Sprites:
     """
 
     def __init__(self) -> None:
-        self.sprites = {}
-        self.split_sprites = {}
+        # Atlas tiles by integer sprite id, id 0 is never used so it can
+        # mean an empty cell
+        self.images = [None]
+        self.atlases = []
+
+        # Sprite id of each tile packed so far keyed by its pixels, so
+        # identical tiles share one id
+        self.tile_hashes = {}
+
+        # Transparent and rotated copies of sprites keyed by
+        # (sprite_id,alpha,rotation), the oldest are removed when full
+        self.variants = OrderedDict()
+        self.variants_size = 1024
 
-    def get_sprite(self,path,name):
+    def add_atlas(self,atlas,rects,keys):
         """
-        Fetches image at path, if it is already in self.sprites,
-        reuse it
+        Gives each tile of an atlas a sprite id, tiles with the same
+        pixel hash as one added before use its id
 
         Parameters:
-        path(str): file path to image
-        name(str): the assigned name to sprite in self.sprites
+        atlas(pg.Surface): atlas surface
+        rects(list): rect of each tile in the atlas
+        keys(list): pixel hash of each tile
+
+        Returns:
+        list: sprite id of each tile, in the same order
         """
 
-        if path in self.sprites.keys():
-            return self.sprites[name]
-        else:
-            self.sprites[name] = pg.image.load(path).convert()
-            return self.sprites[name]
-    
-    def split_spritesheet(self,name,dims):
+        self.atlases.append(atlas)
+
+        tile_ids = []
+        for (rect,key) in zip(rects,keys):
+            if key not in self.tile_hashes.keys():
+                self.tile_hashes[key] = len(self.images)
+                self.images.append(atlas.subsurface(pg.Rect(rect)))
+            tile_ids.append(self.tile_hashes[key])
+
+        return tile_ids
+
+    def get_image(self,sprite_id,alpha=255,rotation=None):
         """
-        Split a spritesheet by name, if it is already in
-        self.split_sprites, reuse it
-        The split images are put into self.sprites with the affix
-        sprite_1, sprite_2, sprite_3, ...
+        Returns image surface with options to make transparent or rotate
+        it, the surface is shared so it must not be changed
 
         Parameters:
-        name(str): name of sprite in self.sprites
-        dims(pg.Vector2): dimension to cut out of sprite
-
-        Returns:
-        list: a list of the sprite names of the newly created sprites
+        sprite_id(int): sprite id of an atlas tile
+        alpha(float): transparency, rounded to a multiple of ALPHA_STEP
+        rotation(int): degrees to rotate by anti-clockwise
         """
 
-        split_sprites = []
+        alpha = min(int(round(alpha/ALPHA_STEP))*ALPHA_STEP,255)
+        rotation = int(rotation or 0) % 360
+
+        sprite = self.images[sprite_id]
 
-        if name in self.split_sprites.keys():
-            
-            for s in self.split_sprites[name]:
-                split_sprites.append(s)
-            
+        # Opaque unrotated images are the sprite itself
+        if alpha == 255 and rotation == 0:
+            return sprite
+
+        key = (sprite_id,alpha,rotation)
+        image = self.variants.get(key)
+
+        if image is None:
+            image = sprite
+            if rotation:
+                image = pg.transform.rotate(image,rotation)
+            else:
+                image = image.copy()
+
+            # Opaque images have no surface alpha so blits skip blending
+            if alpha < 255:
+                image.set_alpha(alpha)
+
+            self.variants[key] = image
+            if len(self.variants) > self.variants_size:
+                self.variants.popitem(last=False)
         else:
-            split_sprites_imgs = split_spritesheet(self.sprites[name],dims)
-            for (i,v) in enumerate(split_sprites_imgs):
-                child_name = f"{name}_{i}"
-                self.sprites[child_name] = v.convert()
-                split_sprites.append(child_name)
-            
-        return split_sprites
-    
-    def get_image(self,name,alpha=255,rotation=None):
-        """Returns image surface with options to make transparent or rotate it"""
+            self.variants.move_to_end(key)
 
-        image = self.sprites[name]
-        image.set_alpha(alpha)
-        if rotation:
-            image = pg.transform.rotate(image,rotation)
         return image
 
 
 class Styles:
     """This class manages different tilesets for the tetriminos to pick from"""
 
-    def __init__(self,sprites) -> None:
+    def __init__(self,sprites,bundle=None) -> None:
         """
         Parameters:
         sprites(Sprites): sprite class
+        bundle(Bundle): asset bundle to read styles from, None reads
+        the style folders
         """
 
-        # Dictionary to store Style objects
+        # Dictionary to store Style objects, their images are loaded
+        # when the style is first used
         self.style_list = {}
+        self.sprites = sprites
 
         # Set default style
         self.current_style = "Cracked Tiles"
@@ -245,11 +486,28 @@ class Styles:
 
         self.switch_alternate = False
 
+        # Backgrounds tiled onto a surface a tile larger than the game,
+        # keyed by (sprite id,game dimensions)
+        self.tiled_backgrounds = {}
+
+        # Position the tiled background was last drawn at
+        self.bg_draw_pos = None
+
+        # Futures of styles being decoded by an AssetLoader keyed by
+        # style name, get_style waits for these rather than decoding the
+        # same style again
+        self.pending = {}
+
         # Read all folders in directory and create a Style object from each
+        if bundle is not None:
+            folders = bundle.styles.keys()
+        else:
+            folders = os.listdir("sprites/styles")
+
         cfg_file = None
-        for f in os.listdir("sprites/styles"):
+        for f in folders:
             cfg_file = os.path.join("sprites","styles",f,"style.cfg")
-            style = Style(cfg_file,sprites)
+            style = Style(cfg_file,sprites,bundle)
             self.style_list[style.name] = style
 
     def get_blocks(self,letter):
@@ -260,19 +518,22 @@ class Styles:
         letter(str): tetrimino name - choose from (J,L,O,T,Z,S,I)
         """
 
-        style = self.style_list[self.current_style]
+        style = self.get_style()
         sprites = []
 
         if style.type in ["separate","separate_c"]:
             variants = None
 
             if style.type == "separate_c":
-                variants = list(style.variants[letter])
+                variants = list(style.variants[letter].values())
             elif style.type == "separate":
-                keys = style.variants.keys()
+                keys = list(style.variants.keys())
                 shuffle(keys)
                 
-                variants = list(style.variants[keys[0]])
+                variants = list(style.variants[keys[0]].values())
+
+            # Blocks use the first frame of a variant
+            variants = [frames[0] for frames in variants]
 
             for i in range(4):
                 shuffle(variants)
@@ -280,20 +541,64 @@ class Styles:
         
         return sprites
     
+    def get_style(self):
+        # Get the current Style, loading its images if needed
+
+        style = self.style_list[self.current_style]
+        if not style.loaded:
+            if style.name in self.pending.keys():
+                self.finish_style(style.name,
+                                  self.pending[style.name].result())
+            else:
+                style.load_images(self.sprites)
+        return style
+
+    def finish_style(self,name,decoded):
+        # Convert a decoded style by name, on the main thread
+
+        self.pending.pop(name,None)
+        self.style_list[name].finish(self.sprites,decoded)
+
     def get_rotation(self):
         return self.style_list[self.current_style].rotation
     
     def get_score_anim(self):
-        return self.style_list[self.current_style].score_animation
+        return self.get_style().score_animation
     
     def get_anim_delay(self):
         return self.style_list[self.current_style].animation_delay
     
-    def draw_background(self,dt,window,sprites):
-        sprite_name = self.style_list[self.current_style].bg_image
-        sprite = sprites.get_image(sprite_name)
+    def get_tiled_background(self,sprite_id,sprites,game_dims):
+        """
+        Gets a surface tiled with a background image that covers the
+        game area when drawn up to one tile up and left of it
+
+        Parameters:
+        sprite_id(int): sprite id of background
+        sprites(Sprites): sprite class
+        game_dims(pg.Vector2): size of the game area in pixels
+        """
+
+        key = (sprite_id,tuple(game_dims))
+
+        if key not in self.tiled_backgrounds.keys():
+            sprite = sprites.get_image(sprite_id)
+            (tile_w,tile_h) = sprite.get_size()
+
+            columns = int(game_dims[0]//tile_w) + 2
+            rows = int(game_dims[1]//tile_h) + 2
 
-        starting_pos = V(sprite.get_size()) * -1
+            tiled = pg.Surface((columns*tile_w,rows*tile_h)).convert()
+            tiled.blits([(sprite,(x*tile_w,y*tile_h))
+                         for x in range(columns) for y in range(rows)],
+                        False)
+            self.tiled_backgrounds[key] = tiled
+
+        return self.tiled_backgrounds[key]
+
+    def draw_background(self,dt,window,sprites):
+        sprite_id = self.get_style().bg_image
+        sprite = sprites.get_image(sprite_id)
 
         self.bg_timer[0] = (self.bg_timer[0]+dt)%self.bg_timer_max[0]
         self.bg_timer[1] = self.bg_timer[1]+dt
@@ -307,47 +612,36 @@ class Styles:
         offset_vector = V(0,0)
         offset_vector[0] = easing.lerp(tx,0,sprite.get_width())
         offset_vector[1] = easing.lerp(ty,0,sprite.get_height())
-        
-
-        iterations = V((window.game_dims[0]//sprite.get_width())+3,
-                       (window.game_dims[1]//sprite.get_height())+3)
 
-        for x in range(int(iterations[0])):
-            for y in range(int(iterations[1])):
-                draw_pos = V(starting_pos)
-                draw_pos += V(x*sprite.get_width(),y*sprite.get_height())
-
-                """
-                offset_value = 0
-                if (x % 2 == 1 and self.switch_alternate):
-
-                    draw_pos += V(0,offset_vector[1])
-                    
-                elif (x % 2 == 1 and not self.switch_alternate):
-
-                    draw_pos += V(0,-offset_vector[1])
-                
-                elif self.switch_alternate:
-                    draw_pos += V(0,-offset_vector[1])
-                
-                elif not self.switch_alternate:
-                    draw_pos += V(0,offset_vector[1])"""
+        # The tiles repeat every tile so scrolling by less than a tile
+        # only needs the tiled surface moved
+        tiled = self.get_tiled_background(sprite_id,sprites,
+                                          window.game_dims)
 
+        draw_pos = V(sprite.get_size()) * -1
+        draw_pos += offset_vector
 
-                draw_pos += offset_vector
+        # The background covers the whole game so when it moves a whole
+        # pixel everything is sent to the display without comparing blits
+        pixel_pos = (int(draw_pos[0]),int(draw_pos[1]))
+        if pixel_pos != self.bg_draw_pos:
+            self.bg_draw_pos = pixel_pos
+            window.full_update = True
 
-                window.blit_precise(sprite,draw_pos,V(sprite.get_size()))
+        window.blit_precise(tiled,draw_pos,V(tiled.get_size()))
 
 
 
 class Style:
     """This class reads style data from cfg file for tetrimino sprites"""
 
-    def __init__(self,cfg_file,sprites) -> None:
+    def __init__(self,cfg_file,sprites,bundle=None) -> None:
         """
         Parameters:
         cfg_file(str): path to cfg file
         sprites(Sprites): sprite class
+        bundle(Bundle): asset bundle with the style's config and
+        images, None reads them from the style folder
         """
 
         """
@@ -361,9 +655,19 @@ class Style:
         """
 
         style_path = cfg_file.replace("style.cfg","")
+        self.cfg_file = cfg_file
+        self.folder = os.path.basename(os.path.normpath(style_path))
 
-        config = configparser.ConfigParser()
-        config.read(cfg_file)
+        # Bundled styles keep their config as a dict of sections
+        self.bundle = bundle
+        if bundle is not None:
+            config = bundle.styles[self.folder]["config"]
+        else:
+            config = configparser.ConfigParser()
+            config.read(cfg_file)
+
+        self.config = {section:dict(config[section])
+                       for section in ("Metadata","Images")}
 
         self.name = config["Metadata"]["name"]
         self.creator = config["Metadata"]["creator"]
@@ -375,56 +679,179 @@ class Style:
         self.rotation = bool(config["Images"]["rotation"])
         self.animation_delay = float(config["Images"]["animation_delay"])
 
-        score_name = f"{self.name}_{self.score}"
-        sprites.get_sprite(os.path.join(style_path,self.score),score_name)
-        self.score_animation = sprites.split_spritesheet(score_name,V(16,16))
-        
-        bg_name = f"{self.name}_{self.background}"
-        sprites.get_sprite(os.path.join(style_path,self.background),bg_name)
-        self.bg_image = bg_name
+        self.path = style_path
+        self.loaded = False
 
-        # Each image file is for a seperate piece, the x axis is for
-        # animation and the y axis is for variants in the same figure
+    def load_images(self,sprites):
+        """
+        Loads the images of the style into one atlas, from the asset
+        cache if the image files haven't changed
+
+        Parameters:
+        sprites(Sprites): sprite class
+        """
 
+        self.finish(sprites,self.decode())
+
+    def sources(self):
+        # Paths of the images the style is made from
+        return [os.path.join(self.path,f)
+                for f in [self.score,self.background]+self.blocks]
+
+    def decode(self):
+        # Load the atlas and tile data, can be run on any thread
+
+        if self.bundle is not None:
+            entry = self.bundle.styles[self.folder]
+            return (self.bundle.surface(entry),entry["data"])
+
+        return load_cached("style-"+self.folder,self.sources(),self.pack)
+
+    def finish(self,sprites,decoded):
+        # Convert a decoded atlas and give its tiles sprite ids, on the
+        # main thread
+
+        if self.loaded:
+            return
+
+        (atlas,data) = decoded
+        tile_ids = sprites.add_atlas(atlas.convert(),data["rects"],
+                                     data["keys"])
+
+        self.score_animation = [tile_ids[i] for i in data["score"]]
+        self.bg_image = tile_ids[data["background"]]
+
+        # variants[letter][variant] is a list of sprite ids of each frame
         self.variants = {}
+        for (letter,variants) in data["variants"].items():
+            self.variants[letter] = {}
+            for (var,frames) in enumerate(variants):
+                self.variants[letter][var] = [tile_ids[i] for i in frames]
+
+        self.loaded = True
+
+    def pack(self):
+        # Cut every image of the style into tiles and pack them into an
+        # atlas, data has the index of each tile for the score
+        # animation, background and block variants
 
+        score_tiles = split_spritesheet(self.load_image(self.score),V(16,16))
+        tiles = score_tiles + [self.load_image(self.background)]
+
+        data = {"score":list(range(len(score_tiles))),
+                "background":len(score_tiles),
+                "variants":{}}
+
+        # Each image file is for a seperate piece, the x axis is for
+        # animation and the y axis is for variants in the same figure
         for img_name in self.blocks:
-            self.variants[img_name[:-4]] = {}
+            spritesheet = self.load_image(img_name)
+            dims = V(spritesheet.get_width(),16)
 
-            location = os.path.join(style_path,img_name)
-            spritesheet_name = f"{self.name}_{img_name[:-4]}"
-            sprites.get_sprite(location,spritesheet_name)
+            variants = []
+            for var in split_spritesheet(spritesheet,dims):
+                frames = split_spritesheet(var,V(16,16))
+                variants.append(list(range(len(tiles),len(tiles)+len(frames))))
+                tiles += frames
+            data["variants"][img_name[:-4]] = variants
 
-            dims = V(sprites.sprites[spritesheet_name].get_size()[0],16)
-            var_list = sprites.split_spritesheet(spritesheet_name,dims)
+        (atlas,data["rects"],data["keys"]) = pack_atlas(tiles)
+        return (atlas,data)
 
-            for var in var_list:
-                self.variants[img_name[:-4]][var] = sprites.split_spritesheet(var,V(16,16))
-        
+    def load_image(self,img_name):
+        # Load an image in the style folder
+        return pg.image.load(os.path.join(self.path,img_name))
 
-        
-        
-            
-            
 
 
-            
+class AssetLoader:
+    """
+    Decodes asset files on worker threads so the window keeps responding,
+    decoded surfaces are converted and added on the main thread in update
+    """
 
+    def __init__(self,workers=4) -> None:
+        """
+        Parameters:
+        workers(int): number of worker threads
+        """
 
+        self.pool = ThreadPoolExecutor(workers)
 
+        # (future,finish function) pairs still waiting to be finished
+        self.tasks = []
+        self.total = 0
+        self.finished = 0
 
-            
-        
+    def add(self,work,finish):
+        """
+        Runs work on a worker thread and finish on the main thread with
+        its result
 
+        Parameters:
+        work(function): takes no arguments, must not convert surfaces
+        finish(function): takes the result of work
 
+        Returns:
+        Future: the result of work
+        """
 
-    
-            
+        future = self.pool.submit(work)
+        self.tasks.append((future,finish))
+        self.total += 1
+        return future
 
+    def load_styles(self,styles,sprites):
+        """Loads every style that hasn't been loaded"""
 
-            
+        for (name,style) in styles.style_list.items():
+            if not style.loaded:
+                styles.pending[name] = self.add(
+                    style.decode,
+                    lambda decoded,name=name:styles.finish_style(name,decoded))
 
+    def load_fonts(self,fonts):
+        """Loads every font that hasn't been loaded"""
 
+        for type in fonts.font_files.keys():
+            if type not in fonts.fonts.keys():
+                fonts.pending[type] = self.add(
+                    lambda type=type:fonts.decode_font(type),
+                    lambda decoded,type=type:fonts.finish_font(type,decoded))
 
-        
-        
\ No newline at end of file
+    def update(self,time_budget=0.005):
+        """
+        Finishes decoded assets until time_budget seconds have passed,
+        use once a frame
+
+        Parameters:
+        time_budget(float): most time spent finishing assets
+        """
+
+        start = time.perf_counter()
+
+        for task in list(self.tasks):
+            if time.perf_counter() - start > time_budget:
+                break
+
+            (future,finish) = task
+            if future.done():
+                finish(future.result())
+                self.tasks.remove(task)
+                self.finished += 1
+
+    @property
+    def progress(self):
+        """Fraction of assets finished from 0 to 1"""
+
+        if self.total == 0:
+            return 1
+        return self.finished/self.total
+
+    @property
+    def done(self):
+        return len(self.tasks) == 0
+
+    def close(self):
+        """Stops the worker threads"""
+        self.pool.shutdown(wait=False,cancel_futures=True)
@@ -0,0 +1,84 @@
+import numpy as np
+import batch
+import engine
+import pieces
+
+
+def low_placement(board,mino,rng):
+    # Picks a placement with the highest top row so games last long
+    # enough to clear lines, ties are picked at random
+
+    best = []
+    for rot in range(4):
+        top = min(dy for (_,dy) in pieces.CELLS[mino][rot])
+        for x in range(-pieces.X_MARGIN,board.width):
+            if board.fits(mino,rot,x,0):
+                y = board.drop_distance(mino,rot,x,0) + top
+                best.append((y,rng.random(),x,rot))
+    if len(best) == 0:
+        return (0,0)
+    (_,_,x,rot) = max(best)
+    return (x,rot)
+
+
+def test_batch_matches_engine():
+    n = 16
+    games = batch.BatchEngine(n,width=7,height=12,seed=3)
+    rng = np.random.default_rng(4)
+
+    engines = []
+    for _ in range(n):
+        game = engine.Engine(width=7,height=12,seed=0)
+        game.game_over = False
+        engines.append(game)
+    tracked = set(range(n))
+
+    for _ in range(60):
+        types = games.current.copy()
+        rotation = rng.integers(0,4,n)
+        (lowest,highest) = games.x_range(types,rotation)
+        x = rng.integers(lowest,highest+1)
+        for i in tracked:
+            (x[i],rotation[i]) = low_placement(engines[i].board,
+                                               pieces.PIECE_TYPES[types[i]],rng)
+
+        games.place(x,rotation)
+
+        for i in list(tracked):
+            # Drop the same piece straight down from spawn in the engine
+            game = engines[i]
+            game.active = engine.Piece(pieces.PIECE_TYPES[types[i]])
+            (game.active.x,game.active.y) = (int(x[i]),game.drop_pos[1])
+            game.active.rotation = int(rotation[i])
+
+            if not game.valid_pos():
+                assert games.game_over[i]
+                tracked.remove(i)
+                continue
+
+            game.hard_drop()
+
+            assert list(games.boards[i]) == game.board.masks
+            assert games.score[i] == game.score.score
+            assert games.lines[i] == game.lines
+
+            if games.game_over[i]:
+                tracked.remove(i)
+
+    # Make sure lines were cleared and games ended along the way
+    assert games.lines.sum() > 0
+    assert games.game_over.any()
+
+
+def test_hold_swaps_in_the_next_piece_then_the_held_one():
+    games = batch.BatchEngine(4,seed=1)
+    first = games.current.copy()
+    second = games.queue[:,0].copy()
+
+    games.hold(games.index)
+    assert (games.held == first).all()
+    assert (games.current == second).all()
+
+    games.hold(games.index)
+    assert (games.held == second).all()
+    assert (games.current == first).all()
@@ -0,0 +1,176 @@
+import bot
+import engine
+import rotation
+
+
+def set_rows(board,rows):
+    # Fills the board from the bottom up with rows of "#" and "." strings
+
+    for (i,row) in enumerate(reversed(rows)):
+        y = board.height - 1 - i
+        for (x,char) in enumerate(row):
+            if char == "#":
+                board.masks[y] |= 1 << x
+                board.counts[y] += 1
+                board.cells[y*board.width + x] = 1
+
+
+def get_rows(board,count):
+    # Gets the bottom rows of the board as "#" and "." strings
+
+    rows = []
+    for y in range(board.height-count,board.height):
+        rows.append("".join("#" if board.occupied(x,y) else "."
+                            for x in range(board.width)))
+    return rows
+
+
+def place_active(game,type,x,y,rot):
+    # Puts a piece of the given type where the active piece is
+
+    game.active = engine.Piece(type)
+    (game.active.x,game.active.y,game.active.rotation) = (x,y,rot)
+
+
+def test_clear_rows_moves_blocks_above_down():
+    board = engine.Board(4,6)
+    set_rows(board,["#...",
+                    "####",
+                    ".#..",
+                    "####",
+                    "####",
+                    "..#."])
+    for y in range(board.height):
+        for x in range(board.width):
+            if board.occupied(x,y):
+                board.cells[y*board.width + x] = y + 1
+
+    board.clear_rows(board.full_rows())
+
+    assert get_rows(board,6) == ["....",
+                                 "....",
+                                 "....",
+                                 "#...",
+                                 ".#..",
+                                 "..#."]
+    assert board.counts == [0,0,0,1,1,1]
+    assert list(board.row(3)) == [1,0,0,0]
+    assert list(board.row(4)) == [0,3,0,0]
+    assert list(board.row(5)) == [0,0,6,0]
+
+
+def test_hard_drop_clears_lines_and_scores():
+    game = engine.Engine(seed=1)
+    set_rows(game.board,["#########.",
+                         "#########.",
+                         "#########.",
+                         "#########."])
+    place_active(game,"I",7,0,1)
+
+    game.step(engine.Inputs(["hard_drop"]),0)
+
+    assert game.lines == 4
+    assert get_rows(game.board,4) == [".........."]*4
+    assert game.score.score == 800 + 2*18
+
+
+def test_t_spin_scores_more_than_a_single():
+    rows = ["#.#.......",
+            "...#######",
+            "#..#######"]
+
+    scores = []
+    for rotated in (True,False):
+        game = engine.Engine(seed=1)
+        set_rows(game.board,rows)
+        place_active(game,"T",0,19,2)
+        game.last_move_rotation = rotated
+
+        game.step(engine.Inputs(["hard_drop"]),0)
+
+        assert game.lines == 1
+        scores.append(game.score.score)
+
+    assert scores == [800 + 2*19,100 + 2*19]
+
+
+def test_rotating_in_open_space_does_not_kick():
+    for name in rotation.ROTATION_SYSTEMS:
+        game = engine.Engine(seed=1,rotation_system=name)
+        for type in "IJLOSTZ":
+            for turns in (1,-1,2):
+                place_active(game,type,3,8,0)
+                assert game.rotate(turns)
+                assert (game.active.x,game.active.y) == (3,8)
+                assert game.active.rotation == turns % 4
+
+
+def test_rotating_against_a_wall_kicks():
+    # A vertical I against the left wall kicks right to lie flat
+    game = engine.Engine(seed=1)
+    place_active(game,"I",-2,8,1)
+
+    assert game.rotate()
+    assert (game.active.x,game.active.y,game.active.rotation) == (0,8,2)
+
+    # With no room to kick the rotation fails and nothing changes
+    game = engine.Engine(seed=1)
+    set_rows(game.board,[".#########",
+                         ".#########",
+                         ".#########",
+                         ".#########"])
+    place_active(game,"I",-2,18,1)
+
+    assert not game.rotate()
+    assert (game.active.x,game.active.y,game.active.rotation) == (-2,18,1)
+
+
+def test_fixed_step_runs_whole_steps():
+    stepper = engine.FixedStep(rate=100)
+    steps = []
+
+    assert stepper.advance(0.025,engine.Inputs(),steps.append) == 2
+    assert abs(stepper.alpha - 0.5) < 1e-9
+    assert stepper.advance(0.005,engine.Inputs(),steps.append) == 1
+    assert stepper.steps == 3 and len(steps) == 3
+
+
+def test_fixed_step_drops_time_past_max_steps():
+    stepper = engine.FixedStep(rate=100,max_steps=4)
+    steps = []
+
+    assert stepper.advance(1,engine.Inputs(),steps.append) == 4
+    assert stepper.accumulator == 0
+
+
+def test_fixed_step_keeps_presses_until_a_step():
+    stepper = engine.FixedStep(rate=100)
+    steps = []
+
+    # A press in a frame shorter than a step goes to the next step
+    stepper.advance(0.004,engine.Inputs(["hard_drop"]),steps.append)
+    assert steps == []
+
+    stepper.advance(0.026,engine.Inputs(held=["left"]),steps.append)
+    assert [inputs.pressed for inputs in steps] == [{"hard_drop"},set(),set()]
+    assert all(inputs.held == {"left"} for inputs in steps)
+
+
+def test_seeded_bot_game_is_the_same_at_any_frame_rate():
+    results = []
+    for fps in (30,60,144):
+        game = engine.Engine(seed=5)
+        player = bot.Bot(depth=0,beam_width=1,pps=3,time_budget=10)
+        stepper = engine.FixedStep()
+
+        def step(inputs):
+            game.step(player.update(stepper.tick,game),stepper.tick)
+
+        for _ in range(20*fps):
+            stepper.advance(1/fps,engine.Inputs(),step)
+
+        results.append((game.pieces_placed,game.lines,game.score.score,
+                        tuple(game.board.masks)))
+
+    assert results[0][0] > 0
+    assert results[0] == results[1] == results[2]
@@ -0,0 +1,94 @@
+import random
+import engine
+import pieces
+import search
+
+TICK = 1/120
+
+
+def random_masks(seed,width=10,height=22,rows=8):
+    # Board with random holes and overhangs in the bottom rows
+
+    rng = random.Random(seed)
+    masks = [0]*height
+    for y in range(height-rows,height):
+        masks[y] = rng.getrandbits(width) & ~(1 << rng.randrange(width))
+    return masks
+
+
+def make_game(masks,mino):
+    # Engine with the given board and mino as the active piece
+
+    game = engine.Engine(seed=0)
+    for (y,mask) in enumerate(masks):
+        game.board.masks[y] = mask
+        for x in range(game.width):
+            if mask >> x & 1:
+                game.board.counts[y] += 1
+                game.board.cells[y*game.width + x] = 1
+
+    game.active = engine.Piece(mino)
+    game.spawn(game.active)
+    return game
+
+
+def replay(game,path):
+    # Steps the engine through a path the same way Bot does, returning
+    # where the piece was when it was hard dropped
+
+    for action in path:
+        if action == "down":
+            while game.drop_distance() > 0:
+                game.step(engine.Inputs(held=["down"]),TICK)
+            continue
+
+        if action == "hard_drop":
+            piece = game.active
+            landing = (piece.x,piece.y+game.drop_distance(),piece.rotation)
+
+        game.step(engine.Inputs([action]),TICK)
+
+    return landing
+
+
+def test_empty_board_placement_counts():
+    finder = search.PlacementFinder()
+    counts = {mino:len(finder.find([0]*22,mino)) for mino in pieces.PIECE_TYPES}
+
+    assert counts == {"O":9,"I":17,"S":17,"Z":17,"T":34,"L":34,"J":34}
+
+
+def test_paths_reach_their_placements_in_engine():
+    finder = search.PlacementFinder()
+    boards = [[0]*22] + [random_masks(seed) for seed in range(4)]
+
+    # A T slot that can only be reached by rotating in
+    boards.append([0]*19 + [0b0000000101,0b1111111000,0b1111111001])
+
+    spins = 0
+    for masks in boards:
+        for mino in pieces.PIECE_TYPES:
+            for placement in finder.find(masks,mino):
+                game = make_game(masks,mino)
+
+                landing = replay(game,placement.path)
+
+                assert landing == placement[:3]
+                assert game.pieces_placed == 1
+                if mino == "T":
+                    assert game.last_move_rotation == placement.spin
+                    spins += placement.spin
+
+    assert spins > 0
+
+
+def test_results_are_cached():
+    finder = search.PlacementFinder(cache_size=1)
+    masks = random_masks(0)
+
+    first = finder.find(masks,"T")
+    assert finder.find(masks,"T") is first
+    finder.find(masks,"L")
+    finder.find(masks,"T")
+
+    assert (finder.hits,finder.misses) == (1,3)
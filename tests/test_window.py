@@ -0,0 +1,70 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+
+import pygame as pg
+import main
+
+V = pg.Vector2
+
+
+def make_window():
+    pg.init()
+    window = main.Window()
+    window.render_mode = "framebuffer"
+    window.fps = 0
+    window.update()
+    return window
+
+
+def striped_surface(size):
+    # Surface with vertical stripes so moving it changes its pixels
+
+    surf = pg.Surface(size)
+    for x in range(0,size[0],8):
+        colour = (200,50,50) if x % 16 == 0 else (50,50,200)
+        surf.fill(colour,pg.Rect(x,0,8,size[1]))
+    return surf
+
+
+def assert_presented(window,draw,frames):
+    # Draws frames and checks the display shows game_surf after each one
+
+    for frame in range(frames):
+        draw(frame)
+        expected = pg.transform.scale(window.game_surf,window.game_rect.size)
+        window.update()
+
+        shown = window.window.subsurface(window.game_rect)
+        assert pg.image.tobytes(shown,"RGB") == pg.image.tobytes(expected,"RGB")
+
+
+def test_moving_oversized_surface_is_presented():
+    window = make_window()
+    (width,height) = window.game_dims
+    big = striped_surface((int(width)+64,int(height)+64))
+
+    def draw(frame):
+        window.blit_precise(big,V(-4*frame,-16),V(big.get_size()))
+
+    assert_presented(window,draw,8)
+
+
+def test_moving_surface_partly_outside_is_presented():
+    window = make_window()
+    small = striped_surface((32,32))
+
+    def draw(frame):
+        window.blit(small,pg.Rect(-24+2*frame,100,32,32))
+
+    assert_presented(window,draw,8)
+
+
+def test_sub_pixel_moves_are_not_sent():
+    window = make_window()
+    small = striped_surface((32,32))
+
+    window.blit(small,V(100.2,100.4))
+    window.update()
+    window.blit(small,V(100.7,100.9))
+    assert window.get_dirty_rects() == []
@@ -25,6 +25,10 @@ class Button:
         self.transition_time = 0
         self.transition_time_max = 0.25
 
+        # Background surface, only filled again when its colour changes
+        self.surf = None
+        self.surf_colour = None
+
     def lerp_colour(self,t:float,colour1:pg.Color,colour2:pg.Color):
         # Lerp alpha and rgb of colour separately
 
@@ -41,7 +45,10 @@ class Button:
 
         return pg.Color(*arguments)
 
-    def update(self,dt,window,fonts,events):
+    def update(self,dt,window,fonts,events,draw=True):
+        # Draws are returned instead of drawn if draw is False, so lists
+        # of buttons can draw them all at once
+
         self.activated = False
         self.focused_activated = False
         current_colour = self.base_colour
@@ -114,14 +121,35 @@ class Button:
         self.draw_rect.height += self.padding[1]*2
         self.draw_rect.center = self.rect.center
 
-        surf = pg.Surface(self.draw_rect.size).convert()
-        surf.fill(current_colour)
-        surf.set_alpha(current_colour.a)
+        draws = self.get_draws(window,fonts,current_colour)
+        if draw:
+            window.blits(draws)
+        return draws
+
+    def get_draws(self,window,fonts,colour):
+        # Get (surface,rect) pairs for the background and text
+
+        draws = []
 
-        window.blit(surf,self.draw_rect,window)
+        if self.surf is None or self.surf.get_size() != self.draw_rect.size:
+            self.surf = pg.Surface(self.draw_rect.size).convert()
+            self.surf_colour = None
 
-        # Draw font
-        fonts.draw_font(self.text,self.rect,window,center=True)
+        if colour != self.surf_colour:
+            self.surf.fill(colour)
+            self.surf.set_alpha(colour.a)
+            self.surf_colour = pg.Color(colour)
+            window.surface_changed(self.surf)
+
+        # Fully transparent backgrounds aren't drawn
+        if colour.a > 0:
+            draws.append((self.surf,self.draw_rect))
+
+        text_surf = fonts.render(self.text,self.rect.width,center=True)
+        draws.append((text_surf,pg.Rect(self.rect.topleft,
+                                        text_surf.get_size())))
+
+        return draws
 
     # Functions used for keyboard only controls
     def focus(self):
@@ -229,6 +257,7 @@ class Button_List:
                     elif events.key_held("down"):
                         self.down()
 
+        draws = []
         draw_pos = V(self.pos)    
         for (name,button) in self.button_dict.items():
             
@@ -244,10 +273,12 @@ class Button_List:
                     button.focused = False
 
             button.rect.topleft = V(draw_pos)
-            button.update(dt,window,fonts,events)
+            draws += button.update(dt,window,fonts,events,False)
 
             draw_pos += V(0,button.rect.height+(button.padding[1]*2)+self.gap)
 
+        window.blits(draws)
+
     def set_option_btn(self,id,option_list,selected=None):
         base_btn = self.button_dict[id]
         self.button_dict[id] = OptionButton(base_btn.text,option_list,